@@ -11,23 +11,75 @@ Data is initially collected from:
 '''
 
 import os
+import sys
+import argparse
 import pathlib
+startingPath = os.getcwd() # Where the program was started from, the paths given on the command line are relative to it
 currentPath = pathlib.Path(__file__).parent.resolve() # Gets this python script file's current location
 os.chdir(currentPath) # Sets the working directory to the current file's location
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import numpy as np
-import scipy as sp
 import time
-import multiprocessing as mp # not used
+import datetime
+import zoneinfo
+import itertools
+import functools
+import math
+import hashlib
+import json
+import shutil
+import collections
+import re
+import concurrent.futures
+import multiprocessing as mp
+import multiprocessing.shared_memory
+import gzip
+import bz2
+import lzma
+try: # Only needed to export Parquet and Arrow files, see TableWriter
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
 class Analysis:
     def __init__(self):
         self.filename = '20220101_20221231_Modesto.tot_lev20' # default file # File needs to be in the same location as this script
         self.aeronetData = dataContainer() # A custom class that is desigend to hold and manage aeronet data specifically
+        self.cache = ParsedFileCache() # Keeps the parsed files on disk so reopening them doesn't parse them again
+        self.aggregates = None # Aggregates kept up to date as rows are appended to the file, see trackAggregates
+        self.plotCache = PlotCache() # The calculated plots, so asking for the same plot again doesn't calculate it again
+        self.fitDegree = 3 # The degree of the polynomial fitted through the plots
+        self.filters = FilterPipeline() # The quality filters every plot's rows have to pass, the Gaussian stage by default; see setFilters
+        self.outputDirectory = None # The plots are shown in windows, unless they are saved here; see setOutput
+        self.shownBackend = None # The backend the plots were shown on before they were saved to files
+        self.outputFormats = ('png',)
+        self.outputPrefix = None # What the file names start with, the site by default
+        self.renderWorkers = None # How many processes save the plots, every core by default
+        self.timeZone = None # The times are in UTC, unless this is an IANA timezone (e.g. 'America/Los_Angeles') or 'longitude', see setTimeZone
+        self.decimation = 'minmax' # How the points of long plots are thinned out before they are drawn, see setDecimation
+        self.decimationWidth = None # The pixels the points are thinned out to, the width of the plot's axes by default
+        self.plotTemplates = {} # (rows, columns) -> the PlotTemplate the plots are drawn on
 
     def __del__(self):
         del self.filename
         del self.aeronetData
+        del self.cache
+        del self.aggregates
+        del self.plotCache
+        del self.fitDegree
+        del self.timeZone
+        del self.outputDirectory
+        del self.shownBackend
+        del self.outputFormats
+        del self.outputPrefix
+        del self.renderWorkers
+        del self.filters
+        del self.decimation
+        del self.decimationWidth
+        del self.plotTemplates
 
     def __len__(self):
         return len(self.aeronetData)
@@ -50,36 +102,374 @@ class Analysis:
         self.filename = '20220101_20221231_Modesto.tot_lev20' # The default file we are working with
         self.readDataFromFile(self.filename)
 
-    def readDataFromFile(self, filename): # Reads all data from the aeronet data, separating out the "extra" info from the actual data
+    def readDataFromFile(self, filename, useCache=True, keepRaw=False, precision=np.float64, workers=None): # Reads all data from the aeronet data, separating out the "extra" info from the actual data
+        # Unless keepRaw is set the raw text is dropped once the columns are decoded, the numbers are then held in precision (np.float64 or np.float32)
+        # With more than one worker the data is split into byte ranges that are parsed in parallel processes
+        # With useCache the parsed columns are kept in a filename.npcache directory written next to the data file, unless self.cache was given another directory
         self.aeronetData.clear()
+        self.aeronetData.setTimeZone(self.timeZone)
+        self.plotCache.clear()
+        self.filename = filename
+        if useCache and self.cache.load(self.filename, self.aeronetData): # The file hasn't changed since it was last parsed
+            if keepRaw:
+                self.aeronetData.readRawSource()
+            else:
+                self.aeronetData.compact(precision)
+            self._rebuildAggregates()
+            return
+        with open(self.filename, 'rb') as dataFile:
+            self._readPreamble(dataFile)
+            self.aeronetData.dataStart = dataFile.tell()
+            if workers != None and workers > 1:
+                self._readDataInParallel(dataFile, workers, keepRaw)
+            else:
+                self.aeronetData.setRawData(dataFile.read())
+                self.aeronetData.dataOffset = dataFile.tell()
+                self.aeronetData.formatData()
+        if useCache:
+            self.cache.save(self.filename, self.aeronetData)
+        if not keepRaw:
+            self.aeronetData.compact(precision)
+        self._rebuildAggregates()
+
+    def _readDataInParallel(self, dataFile, workers, keepRaw=False): # Parses the rest of an open (binary) file in newline aligned byte ranges, one per worker process, and joins the columns back in order
+        start = dataFile.tell()
+        size = os.fstat(dataFile.fileno()).st_size
+        firstLine = dataFile.readline().decode()
+        self.aeronetData.formatHeader()
+        header = self.aeronetData.getFormattedHeader()
+        numeric = ColumnParser.numericColumns(firstLine, header) # Decided once so every range agrees
+        bounds = [start]
+        for part in range(1, workers):
+            dataFile.seek(start + (size - start)*part//workers)
+            dataFile.readline() # On to the start of the next line
+            bounds.append(max(bounds[-1], min(dataFile.tell(), size)))
+        bounds.append(size)
+        ranges = [(first, last) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+        if len(ranges) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                parts = list(pool.map(_parseByteRange, itertools.repeat(self.filename), *zip(*ranges), itertools.repeat(header), itertools.repeat(numeric)))
+        else:
+            parts = [_parseByteRange(self.filename, first, last, header, numeric) for first, last in ranges]
+        columns = {head: np.concatenate([part[head] for part in parts]) if len(parts) != 0 else np.empty(0) for head in header}
+        if keepRaw:
+            dataFile.seek(start)
+            self.aeronetData.setRawData(dataFile.read())
+        self.aeronetData.numericColumns = numeric
+        self.aeronetData.setColumns(columns, None, len(next(iter(columns.values()), [])))
+        self.aeronetData.dataOffset = size
+
+    def setOutput(self, directory=None, formats=('png',), workers=None, prefix=None): # Saves the plots as files in directory instead of showing them, on a non-interactive backend so no display is needed
+        # formats are any that matplotlib saves (png, svg, pdf), the files are named prefix_header.format and are rendered in workers processes; None shows the plots again
+        self.outputDirectory = directory
+        self.outputFormats = tuple(formats)
+        self.renderWorkers = workers
+        self.outputPrefix = prefix
+        if directory != None:
+            os.makedirs(directory, exist_ok=True)
+            if self.shownBackend == None:
+                self.shownBackend = plt.get_backend()
+            plt.switch_backend('Agg')
+        elif self.shownBackend != None: # Back to showing the plots
+            plt.switch_backend(self.shownBackend)
+            self.shownBackend = None
+
+    def outputPath(self, name, extension): # Where a plot is saved, the same for the same site and header every time
+        return os.path.join(self.outputDirectory, re.sub(r'_+', '_', re.sub(r'[^\w.\-]+', '_', self._outputPrefix() + '_' + name)).strip('_') + '.' + extension)
+
+    def _outputPrefix(self): # The site, or the file's name if it has none
+        if self.outputPrefix != None:
+            return self.outputPrefix
+        return self.aeronetData.getLocation().strip() or os.path.splitext(os.path.basename(self.filename))[0]
+
+    def _outputSettings(self): # What a worker process needs to save plots like this one
+        return self.outputDirectory, self.outputFormats, self._outputPrefix(), self.fitDegree, self.decimation, self.decimationWidth
+
+    def setDecimation(self, method='minmax', width=None): # Thins out long plots before drawing them to the lowest and highest point of every pixel ('minmax') or to the points that keep their shape ('lttb'); None draws every point, e.g. for publication
+        if method != None and method not in Decimation.methods:
+            raise ValueError('Unknown decimation method: ' + str(method))
+        self.decimation = method
+        self.decimationWidth = width
+
+    def setFilters(self, *filters): # Replaces the quality filters of the plots, e.g. setFilters(GaussianFilter(), PredicateFilter('Precipitable_Water(cm)', '<', 6))
+        self.filters = FilterPipeline(filters)
+        self.plotCache.clear()
+
+    def getFilterReport(self, head=None): # How many rows every filter kept and dropped in the plots last calculated, of one head or of all of them
+        if head == None:
+            return self.filters.report
+        return self.filters.report.get(head, {})
+
+    def setTimeZone(self, zone): # Converts the times, and so the months and half-days of every plot and aggregate, from UTC to local time
+        # zone is an IANA timezone name, whose daylight saving time is followed, 'longitude' for the nominal timezone of the site's longitude, or None to stay in UTC
+        self.timeZone = zone
+        self.aeronetData.setTimeZone(zone)
+        self.plotCache.clear()
+        self._rebuildAggregates()
+
+    def readAppendedData(self): # Parses only the lines appended to the file since it was read, returns the number of new rows
+        # The whole file is read again if it shrank or its last read line changed, i.e. it was rewritten rather than appended to
+        offset = self.aeronetData.dataOffset
+        try:
+            size = os.stat(self.filename).st_size
+        except OSError:
+            return 0
+        if offset == None or size < offset or not self._lastLineMatches(offset):
+            self.readDataFromFile(self.filename)
+            return len(self)
+        if size == offset:
+            return 0
+        with open(self.filename, 'rb') as dataFile:
+            dataFile.seek(offset)
+            block = dataFile.read(size - offset)
+        end = block.rfind(b'\n') + 1 # A line still being written is left for the next reload
+        if end == 0:
+            return 0
+        rowsBefore = len(self.aeronetData)
+        columns = self.aeronetData.appendBlock(block[:end])
+        self.aeronetData.dataOffset = offset + end
+        self.plotCache.clear() # The plots no longer cover all of the rows
+        if self.aggregates != None:
+            times = self.aeronetData.localize(ColumnParser.parseDateTime(columns[self.aeronetData.getDateHeader()], columns[self.aeronetData.getTimeHeader()]), columns)
+            self.aggregates.update(times, columns)
+        return len(self.aeronetData) - rowsBefore
+
+    def _lastLineMatches(self, offset): # Whether the line that ends at offset still has the time of the last row that was read
+        rowTimes = self.aeronetData.getRowTimes()
+        if rowTimes.size == 0 or self.aeronetData.getDateHeader() == '':
+            return True
+        with open(self.filename, 'rb') as dataFile:
+            start = max(0, offset - 8192)
+            dataFile.seek(start)
+            lines = dataFile.read(offset - start).rstrip(b'\r\n').rsplit(b'\n', 1)
+        fields = lines[-1].decode(errors='replace').split(',')
+        header = self.aeronetData.getFormattedHeader()
+        dateIndex, timeIndex = header.index(self.aeronetData.getDateHeader()), header.index(self.aeronetData.getTimeHeader())
+        if len(fields) <= max(dateIndex, timeIndex):
+            return False
+        try:
+            lastTime = ColumnParser.parseDateTime(np.array([fields[dateIndex]]), np.array([fields[timeIndex]]))[0]
+        except ValueError:
+            return False
+        return lastTime == rowTimes[-1]
+
+    def trackAggregates(self, heads=None, degree=3): # Keeps running aggregates of the columns (all plottable ones by default) that readAppendedData updates with only the new rows
+        if heads == None:
+            heads = [head for head in self.getHeaders() if self._isPlottable(head)]
+        self.aggregates = RunningAggregates(heads, degree)
+        self._rebuildAggregates()
+        return self.aggregates
+
+    def monthlyClimatology(self, heads=None, percentiles=(5, 25, 75, 95), byYear=False, years=None, start=None, end=None): # Monthly statistics of every plottable column (or heads) at once, see Climatology.compute
+        if heads == None:
+            heads = [head for head in self.getHeaders() if self._isPlottable(head)]
+        timeIndex = self.aeronetData.getTimeIndex()
+        rows = timeIndex.mask(None, None, years, start, end)
+        return Climatology.compute(timeIndex.stamps[rows], {head: timeIndex.sortRows(np.asarray(self.aeronetData.getColumn(head)))[rows] for head in heads}, percentiles, byYear)
+
+    def aggregateFromBlocks(self, filename=None, heads=None, blockRows=100000, degree=3, start=None, end=None): # RunningAggregates of a file that is streamed blockRows lines at a time instead of being loaded; by default of every numeric column
+        # Only the columns of heads and the rows from start to end are decoded
+        if filename == None:
+            filename = self.filename
+        aggregates = None if heads == None else RunningAggregates(heads, degree)
+        for times, columns in self._readBlocks(filename, blockRows, heads, start, end):
+            if aggregates == None: # The first block tells which columns hold numbers
+                aggregates = RunningAggregates([head for head, values in columns.items() if values.dtype.kind == 'f'], degree)
+            aggregates.update(times, {head: values for head, values in columns.items() if values.dtype.kind == 'f'})
+        return aggregates if aggregates != None else RunningAggregates([], degree)
+
+    def exportData(self, path, heads=None, filtered=False, month0=None, month1=None, years=None, start=None, end=None, fileFormat=None, chunkRows=100000): # Writes the loaded rows of a query in time order to a Parquet, Arrow or CSV file (see TableWriter), returns how many were written
+        # A Time column of the rows' local datetime64 comes first, then the columns of heads (every one by default); only those columns are decoded and they are written chunkRows rows at a time
+        # filtered leaves the values of the plotted columns that the quality filters drop (see setFilters) missing, and leaves out the rows that have no numeric value left
+        if heads == None:
+            heads = self.getHeaders()
+        timeIndex = self.aeronetData.getTimeIndex()
+        inRange = timeIndex.mask(month0, month1, years, start, end)
+        rows = np.flatnonzero(inRange) # In time order
+        fileRows = rows if timeIndex.order is None else timeIndex.order[rows]
+        keep = self._qualityMasks(heads, timeIndex, inRange) if filtered else {}
+        times = np.asarray(self.aeronetData.getLocalTimes(), dtype='datetime64[s]')
+        with TableWriter(path, fileFormat) as writer:
+            for first in range(0, max(rows.size, 1), chunkRows):
+                chunk = fileRows[first:first + chunkRows]
+                columns = {'Time': times[chunk]}
+                for head in heads:
+                    values = np.asarray(self.aeronetData.getColumn(head))[chunk]
+                    columns[head] = np.where(keep[head][rows[first:first + chunkRows]], values, np.nan) if head in keep else values
+                missing = [np.isnan(columns[head]) for head in heads if columns[head].dtype.kind == 'f']
+                if filtered and len(missing) != 0:
+                    measured = ~np.logical_and.reduce(missing)
+                    columns = {head: column[measured] for head, column in columns.items()}
+                writer.write(columns)
+        return writer.rows
+
+    def exportFromBlocks(self, path, filename=None, heads=None, start=None, end=None, fileFormat=None, blockRows=100000): # exportData of a file that is streamed blockRows lines at a time instead of being loaded, in the order of the file
+        # Only the columns of heads and the rows from start to end are decoded, see readDataInBlocks
+        if filename == None:
+            filename = self.filename
+        with TableWriter(path, fileFormat) as writer:
+            for times, columns in self._readBlocks(filename, blockRows, heads, start, end):
+                writer.write({'Time': times, **columns})
+        return writer.rows
+
+    def exportAggregates(self, path, heads=None, period='halfDay', filtered=False, years=None, start=None, end=None, fileFormat=None, blockRows=None): # Writes the count, mean, standard deviation, minimum and maximum of every half-day, day or month of every plottable column (or heads), returns how many rows were written
+        # One row per column and period, starting at the period's start time; with blockRows the file is streamed instead of loaded, and years and filtered need it loaded
+        statistics = {'halfDay': RunningAggregates.halfDayStats, 'day': RunningAggregates.dayStats, 'month': RunningAggregates.monthStats}
+        if period not in statistics:
+            raise ValueError('Unknown period ' + str(period) + ', use one of ' + ', '.join(statistics))
+        if blockRows != None:
+            if filtered or years != None:
+                raise ValueError('Filtered or yearly aggregates need the whole columns, load the file instead of streaming it')
+            aggregates = self.aggregateFromBlocks(heads=heads, blockRows=blockRows, degree=self.fitDegree, start=start, end=end)
+            heads = [head for head in aggregates.heads if heads != None or self._isPlottable(head)] # By default the numeric columns that would be plotted
+        else:
+            if heads == None:
+                heads = [head for head in self.getHeaders() if self._isPlottable(head)]
+            timeIndex = self.aeronetData.getTimeIndex()
+            inRange = timeIndex.mask(None, None, years, start, end)
+            keep = self._qualityMasks(heads, timeIndex, inRange) if filtered else {}
+            columns = {}
+            for head in heads:
+                values = timeIndex.sortRows(np.asarray(self.aeronetData.getColumn(head), dtype=np.float64))
+                columns[head] = (np.where(keep[head], values, np.nan) if head in keep else values)[inRange]
+            aggregates = RunningAggregates(heads, self.fitDegree)
+            aggregates.update(timeIndex.stamps[inRange], columns)
+        with TableWriter(path, fileFormat) as writer:
+            for head in heads:
+                times, count, mean, deviation, minimum, maximum = statistics[period](aggregates, head)
+                writer.write({'Time': times.astype('datetime64[s]'), 'Header': np.full(times.size, head), 'Count': count, 'Mean': mean, 'Deviation': deviation, 'Minimum': minimum, 'Maximum': maximum})
+        return writer.rows
+
+    def _qualityMasks(self, heads, timeIndex, inRange): # head -> which of the sorted rows pass the quality filters, for the plotted heads; a column the filters can't test keeps nothing
+        heads = [head for head in heads if self._isPlottable(head)]
+        if len(heads) == 0:
+            return {}
+        self.filters.resetReport(heads)
+        keep, usable = self.filters.evaluate(heads, self._plotMatrix(heads, timeIndex), inRange, self._rowMasks(timeIndex))
+        return {head: keep[index] & usable[index] for index, head in enumerate(heads)}
+
+    def _rebuildAggregates(self):
+        if self.aggregates != None:
+            self.aggregates.reset()
+            self.aggregates.update(self.aeronetData.getLocalTimes(), {head: self.aeronetData.getColumn(head) for head in self.aggregates.heads if head in self.getHeaders()})
+
+    def readHeaderFromFile(self, filename): # Reads only the "extra" info and the headers, leaving the data in the file
+        self.aeronetData.clear()
+        self.aeronetData.setTimeZone(self.timeZone)
+        self.plotCache.clear()
         self.filename = filename
         with open(self.filename, 'r') as dataFile:
-            self.aeronetData.setVersion(dataFile.readline())
-            self.aeronetData.setLocation(dataFile.readline())
-            self.aeronetData.setAODLevel(dataFile.readline())
-            self.aeronetData.setDescription(dataFile.readline())
-            self.aeronetData.setContactInfo(dataFile.readline())
-            self.aeronetData.setReference(dataFile.readline())
-            self.aeronetData.setHeader(dataFile.readline())
-            for line in dataFile:
-                if (line != ''):
-                    self.aeronetData.append(line)
-        self.aeronetData.formatData()
-
-    def drawAllPlots(self): # Draws all plots
+            self._readPreamble(dataFile)
+            firstLine = dataFile.readline() # Tells which columns hold numbers
+        self.aeronetData.formatHeader()
+        if firstLine.strip() != '':
+            self.aeronetData.numericColumns = ColumnParser.numericColumns(firstLine, self.aeronetData.getFormattedHeader())
+
+    def readDataInBlocks(self, filename, blockRows=100000, heads=None, start=None, end=None): # Generator that parses the file blockRows lines at a time, for files too large to be loaded; the loaded data is left untouched
+        # Only the columns of heads (every one by default) are decoded, and only the rows from start to end (in local time, see setTimeZone) are kept
+        for _, columns in self._readBlocks(filename, blockRows, heads, start, end):
+            yield columns
+
+    def _readBlocks(self, filename, blockRows=100000, heads=None, start=None, end=None): # readDataInBlocks, with the local times of every block's rows; a block without any rows in range is skipped before its columns are decoded
+        blockData = dataContainer() # Only holds the "extra" info and the headers of the streamed file
+        blockData.setTimeZone(self.timeZone)
+        with open(filename, 'r') as dataFile:
+            self._readPreamble(dataFile, blockData)
+            blockData.formatHeader()
+            header = blockData.getFormattedHeader()
+            index = {head: position for position, head in enumerate(header)}
+            timeHeads = [blockData.getDateHeader(), blockData.getTimeHeader()] + ([blockData.getLongitudeHeader()] if self.timeZone == 'longitude' and blockData.getLongitudeHeader() != '' else [])
+            numeric = None
+            while True:
+                lines = list(itertools.islice(dataFile, blockRows))
+                if len(lines) == 0:
+                    break
+                block = ColumnParser.dropBlankLines(''.join(lines).encode())
+                if block.strip() == b'':
+                    continue
+                if not block.endswith(b'\n'):
+                    block += b'\n'
+                if numeric == None: # The first row decides which columns are numeric
+                    numeric = ColumnParser.numericColumns(block[:block.index(b'\n')].decode(), header)
+                layout = ColumnParser.blockLayout(block)
+                columns = {head: ColumnParser.parseColumn(block, index[head], numeric[index[head]], layout) for head in timeHeads}
+                times = blockData.localize(ColumnParser.parseDateTime(columns[timeHeads[0]], columns[timeHeads[1]]), columns)
+                rows = slice(None)
+                if start != None or end != None:
+                    rows = TimeIndex.contains(times, *TimeIndex.windows(start=start, end=end, first=times.min(), last=times.max()))
+                    if not np.any(rows):
+                        continue
+                yield times[rows], {head: (columns[head] if head in columns else ColumnParser.parseColumn(block, index[head], numeric[index[head]], layout))[rows] for head in (header if heads == None else heads)}
+
+    def _readPreamble(self, dataFile, container=None, maxLines=30): # Reads the lines that come before the data
+        # The header is the first line with a dd:mm:yyyy column, the AOD files have six lines before it but the SDA and inversion files may have more
+        if container == None:
+            container = self.aeronetData
+        readline = dataFile.readline
+        if 'b' in dataFile.mode: # Binary files give bytes
+            readline = lambda: dataFile.readline().decode().replace('\r\n', '\n')
+        lines = []
+        afterSeventhLine = None
+        header = None
+        while len(lines) < maxLines:
+            line = readline()
+            if line == '':
+                break
+            if 'dd:mm:yyyy' in line and ',' in line:
+                header = line
+                break
+            lines.append(line)
+            if len(lines) == 7:
+                afterSeventhLine = dataFile.tell()
+        if header == None: # No recognizable header, the seventh line is taken as it always was
+            if afterSeventhLine != None:
+                dataFile.seek(afterSeventhLine)
+            lines += [''] * 7
+            header = lines[6]
+            lines = lines[:6]
+        contact = next((index for index, line in enumerate(lines) if index > 2 and line.startswith('Contact')), 4)
+        container.setVersion(lines[0] if len(lines) > 0 else '')
+        container.setLocation(lines[1] if len(lines) > 1 else '')
+        container.setAODLevel(lines[2] if len(lines) > 2 else '')
+        container.setDescription(''.join(lines[3:contact]))
+        container.setContactInfo(lines[contact] if len(lines) > contact else '')
+        container.setReference(''.join(lines[contact + 1:]))
+        container.setHeader(header)
+
+    def drawAllPlots(self, blockRows=None): # Draws all plots; with blockRows the file is streamed in blocks of rows instead of being loaded
+        if blockRows != None:
+            self.readHeaderFromFile(self.filename)
+        header = self.aeronetData.getFormattedHeader()
+        if blockRows != None: # Every plot is calculated from the same two passes over the file
+            plots = self._calculatePlotsFromBlocks([head for head in header if self._isPlottable(head)], blockRows=blockRows)
+        else: # Every plot is calculated at once from a single time x column matrix
+            plots = self._calculatePlots([head for head in header if self._isPlottable(head)])
+        return self._drawPlots(header, plots)
+
+    def _isPlottable(self, head): # The dates, times, and anything including the 'day' keyword or a name/level/processed date are not plotted
+        # Neither are text columns or the size distribution bins, whose headers are their radii
+        if 'dd:mm:yyyy' in head or 'hh:mm:ss'  in head or 'day' in head.lower() or 'level' in head.lower() or 'name' in head.lower() or 'processed' in head.lower():
+            return False
+        return self.aeronetData.isNumeric(head) and not ColumnParser.isNumeric(head)
+
+    def drawAllPlotsMultProcessor(self, workers=None, useThreads=False): # Draws all plots but utilizing multiprocessing to calculate each plot
+        # The columns are split between a pool of worker processes, which read them from shared memory; useThreads uses a pool of threads instead
         header = self.aeronetData.getFormattedHeader()
-        dateHead = self.aeronetData.getDateHeader()
+        plots = self._calculatePlotsInParallel([head for head in header if self._isPlottable(head)], workers, useThreads)
+        return self._drawPlots(header, plots)
+
+    def _drawPlots(self, header, plots): # Draws the calculated plots in the order of the headers, returns how many were drawn
         headDataArray = []
         xDataArray = []
         yDataArray = []
         yDataError = [] 
         count = 0
         for head in header: # Iterate thru the list of headers
-            if 'dd:mm:yyyy' in head or 'hh:mm:ss'  in head or 'day' in head.lower() or 'level' in head.lower() or 'name' in head.lower() or 'processed' in head.lower(): # Do not draw graphs of the dates, times, or anything including the 'day' keyword
+            if not self._isPlottable(head): # Do not draw graphs of the dates, times, or anything including the 'day' keyword
                 continue # Omit these 'Data_Quality_Level', 'AERONET_Site_Name', 'Last_Date_Processed'
             else:
                 #print(head)
-                tempX, tempY, tempErr = self._calculatePlot(head, dateHead)
+                tempX, tempY, tempErr = plots[head]
                 if tempX.size <= 1: # If the data is empty we won't append its data to the data Arrays
                     pass
                 elif tempX.size != 0:
@@ -87,43 +477,63 @@ class Analysis:
                     xDataArray.append(tempX)
                     yDataArray.append(tempY)
                     yDataError.append(tempErr)
+        fits = self._batchFit(yDataArray) # Every curve fit solved together
+        if self.outputDirectory != None and self.renderWorkers != 1 and len(xDataArray) > 1: # The files are saved by a pool of worker processes
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.renderWorkers) as pool:
+                return sum(pool.map(_renderPlot, itertools.repeat(self._outputSettings()), headDataArray, xDataArray, yDataArray, yDataError, fits))
         for index, value in enumerate(xDataArray):
-            if self._drawplot(headDataArray[index], value, yDataArray[index], yDataError[index]):
+            if self._drawplot(headDataArray[index], value, yDataArray[index], yDataError[index], fits[index]):
                 count += 1
         return count
 
-    def drawAllPlotsMultProcessor(self): # Draws all plots but utilizing multiprocessing to calculate each plot # WIP
-        # Work in progress, not functioning, not used
-        header = self.aeronetData.getFormattedHeader()
-        dateHead = self.aeronetData.getDateHeader()
-        headDataArray = []
-        xDataArray = []
-        yDataArray = []
-        yDataError = [] 
-        dateHeadArray = []
-        for head in header:
-            dateHeadArray.append(dateHead)
-        count = 0
-        #with multiProcess.Pool(len(os.sched_getaffinity(0))) as pool: # Calculates all plots
-        with mp.Pool(os.cpu_count()) as pool:
-            print(pool.starmap(self._calculatePlot, zip(header, dateHeadArray))) # Debugging
-        for index, value in enumerate(xDataArray): # Draws plots
-            if self._drawplot(headDataArray[index], value, yDataArray[index], yDataError[index]):
-                count += 1
-        return count
+    def _calculatePlotsInParallel(self, heads, workers=None, useThreads=False, month0=None, month1=None, years=None, start=None, end=None): # _calculatePlots with the columns split between workers, the results come back in the order of heads
+        return self._cachedPlots(heads, (month0, month1, years, start, end), lambda missing: self._computePlotsInParallel(missing, workers, useThreads, month0, month1, years, start, end))
 
-    def drawSpecificPlot(self, head, dateHead, gaussianGraph=False, monthStart=None, monthEnd=None): # Draws a specified plot
-        xData, yData, yErr = self._calculatePlot(head, dateHead, gaussianGraph, month0=monthStart, month1=monthEnd)
+    def _computePlotsInParallel(self, heads, workers=None, useThreads=False, month0=None, month1=None, years=None, start=None, end=None): # _calculatePlotsInParallel without the plot cache
+        heads = list(dict.fromkeys(heads))
+        if len(heads) == 0:
+            return {}
+        if workers == None:
+            workers = os.cpu_count() or 1
+        timeIndex = self.aeronetData.getTimeIndex()
+        inRange = timeIndex.mask(month0, month1, years, start, end)
+        rowMasks = self._rowMasks(timeIndex) # The cross column filters are worked out here, the workers only see the columns they plot
+        shape = (len(heads), len(timeIndex))
+        chunks = [(int(rows[0]), int(rows[-1]) + 1) for rows in np.array_split(np.arange(len(heads)), min(workers, len(heads)))] # Consecutive columns for every worker
+        if useThreads: # The threads see the matrix directly, numpy lets go of the GIL for the heavy lifting
+            matrix = self._plotMatrix(heads, timeIndex)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                parts = list(pool.map(lambda chunk: self._calculatePlotsOfMatrix(matrix[chunk[0]:chunk[1]], timeIndex.stamps, inRange, heads[chunk[0]:chunk[1]], self.filters, rowMasks), chunks))
+        else:
+            shared = mp.shared_memory.SharedMemory(create=True, size=max(shape[0]*shape[1]*8 + shape[1]*9, 1)) # The matrix, the times and inRange
+            try:
+                matrix, stamps, sharedRange = _sharedPlotArrays(shared.buf, shape)
+                self._plotMatrix(heads, timeIndex, matrix) # Built straight into the shared memory
+                stamps[:], sharedRange[:] = timeIndex.stamps, inRange
+                del matrix, stamps, sharedRange # The memory can't be released while numpy still points into it
+                with mp.Pool(len(chunks)) as pool:
+                    results = pool.starmap(_calculatePlotsInSharedMemory, [(shared.name, shape, first, last, heads[first:last], self.filters.filters, rowMasks) for first, last in chunks])
+            finally:
+                shared.close()
+                shared.unlink()
+            parts = [plots for plots, _ in results]
+            for _, report in results:
+                self.filters.report.update(report)
+        return dict(zip(heads, itertools.chain.from_iterable(parts)))
+
+    def drawSpecificPlot(self, head, dateHead, gaussianGraph=False, monthStart=None, monthEnd=None, year=None, start=None, end=None): # Draws a specified plot
+        xData, yData, yErr = self._calculatePlot(head, dateHead, gaussianGraph, month0=monthStart, month1=monthEnd, years=year, start=start, end=end)
         if xData.size <= 1:
             return False
         return self._drawplot(head, xData, yData, yErr)
 
-    def drawSpecificPlots(self, heads, dateHead, gaussianGraph=False, monthStart=None, monthEnd=None, year=None): # Calculates multiple plot from an array of heads, then draws them
+    def drawSpecificPlots(self, heads, dateHead, gaussianGraph=False, monthStart=None, monthEnd=None, year=None, start=None, end=None, grid=None): # Calculates multiple plot from an array of heads, then draws them
+        # With grid they are drawn as small multiples, grid plots on every figure
         xDataArray, yDataArray, yErrArray = [], [], []
         acceptableHeads = []
         count = 0
         for index, value in enumerate(heads):
-            xData, yData, yErr = self._calculatePlot(value, dateHead, gaussianGraph, month0=monthStart, month1=monthEnd, years=year)
+            xData, yData, yErr = self._calculatePlot(value, dateHead, gaussianGraph, month0=monthStart, month1=monthEnd, years=year, start=start, end=end)
             if xData.size <= 1:
                 pass
             elif xData.size != 0:
@@ -131,17 +541,17 @@ class Analysis:
                 xDataArray.append(xData)
                 yDataArray.append(yData)
                 yErrArray.append(yErr)
+        fits = self._batchFit(yDataArray) # Every curve fit solved together
+        if grid != None:
+            return self._drawGrid(acceptableHeads, xDataArray, yDataArray, yErrArray, fits, grid)
         for index, head in enumerate(acceptableHeads):
-            if self._drawplot(head, xDataArray[index], yDataArray[index], yErrArray[index]):
+            if self._drawplot(head, xDataArray[index], yDataArray[index], yErrArray[index], fits[index]):
                 count += 1
         return count
 
     def printSpecificData(self, head):
-        data = self.aeronetData.getFormattedData()
         for i in head:
-            information = i + ' '
-            for j in data:
-                information += data[j][i] + ' '
+            information = i + ' ' + ' '.join(str(value) for value in self.aeronetData.getColumn(i).tolist())
             print(information)
             input('Press any key to continue...')
 
@@ -198,402 +608,251 @@ class Analysis:
         evening = np.sqrt(sum/len(intArray))
         return afternoon, evening
 
-    def _myCurve_Polynomial(self, xInput, a, b, c, d): # Polynomial of degree 3
-        x = np.array(xInput)
-        return a*x + b*x**2 + c*x**3 + d#*x**4 + e*x**5 + f
-
     def _rootMeanSquare(self, intArray): # NOT USED # Returns almost the stdDev of an array # Not used
         sum = 0
         for i in intArray:
             sum = sum + (i - np.mean(intArray))**2
         return np.sqrt(sum/len(intArray)) 
 
-    def _convertGMTtoPST(self, timeInput, dateInput): # Takes in both the date of the day and the time of the day and converts it into PST; takes leap years into consideration
-        # Format: Date(dd:mm:yyyy),Time(hh:mm:ss)
-        monthsWith31Days = ['01', '03', '05', '07', '08', '10', '12']
-        monthsWith30Days = ['04', '06', '09', '11']
-        tempTime = int(timeInput[0] + timeInput[1]) - 8
-        tempDate, month = '', ''
-        if not tempTime >= 0: # If the new time is less than midnight then the day must be decremented 
-            tempTime += 24
-            if (int(dateInput[0]) == 0) and (int(dateInput[1]) == 1): # If the date is the first of the month then we will need to decremente the month
-                if (int(dateInput[3]) == 0) and (int(dateInput[4] == 1)): # If it is the first of the year, then we must decrement the year too
-                    tempDate = '31' + ':' + '12' + str(int(dateInput[5:10])-1) # December, New Year's Day
-                else: # Otherwise we just have to decrement the month
-                    if (int(dateInput[3] + dateInput[4]) - 1) < 10: # First we check if we need to add a zero infront of the month
-                        month = '0' + str(int(dateInput[3] + dateInput[4]) - 1)
-                    else: # Here the result is double digit so we don't need to add a zero
-                        month = str(int(dateInput[3] + dateInput[4]) - 1)
-                    # Check if we need a 0
-                    if month in monthsWith31Days:
-                        tempDate = '31' + ':' + month + dateInput[5:10]# Changes depending on the month we are now in
-                    elif month in monthsWith30Days:
-                        tempDate = '30' + ':' + month + dateInput[5:10]
-                    elif month == '02': # If the new month is feburary then we need to check for leap year
-                        if int(dateInput[6] + dateInput[7] + dateInput[8] + dateInput[9]) % 400 == 0: # End of centuries evenly divisible by 400 are leap years, others are not leap years
-                            tempDate = '29' + ':' + month + dateInput[5:10]
-                        elif int(dateInput[6:10]) % 4 == 0: # Years that are Evenly divisible 4 are leap years 
-                            tempDate = '29' + ':' + month + dateInput[5:10]
-                        else: # Non-leap years only have 28 days in february
-                            tempDate = '28' + ':' + month + dateInput[5:10]
-                    else:
-                        tempDate = 'ERROR' + month
-            else: # Here we're just decrementing the day
-                if int(dateInput[0] + dateInput[1]) - 1 < 10:
-                    tempDate = '0' + str(int(dateInput[0] + dateInput[1]) -1) + dateInput[2:10]
-                else:
-                    tempDate = str(int(dateInput[0] + dateInput[1]) -1) + dateInput[2:10]
-        else: # We are not crossing midnight
-            tempDate = dateInput
-        tempTimeStr = ''
-        if tempTime < 10:
-            tempTimeStr = '0' + str(tempTime)
-        else:
-            tempTimeStr = str(tempTime)
-        returnTime = tempTimeStr + timeInput[2:10]
-        returnDate = tempDate
-        #print(returnDate, returnTime)
-        if returnDate != dateInput:
-            print(dateInput, returnDate)
-        return returnTime, returnDate
-
-    def _standardDeviation(self, intArray): # Returns the stdDev of an array
-        # This is the root mean square formula
-        sum = 0
-        for x in intArray:
-            sum = sum + (x-np.mean(intArray))**2
-        return (np.sqrt(sum/len(intArray)) * np.sqrt(2)) # Adding in sqrt(2) to cancel out a log 2
-
-    def _gaussian(self, intArray, dateArray=None, timeArray=None, graph=False): # returns an array of acceptable values within a gaussian "range"
-        xpoints = []
-        ypoints = []
-        Amplitude = np.amax(intArray)
-        sigma = self._standardDeviation(intArray)
-        '''
-        if dateArray == None: # Not used and redundant
-            for x in intArray:
-                xpoints.append(x)
-                ypoints.append(Amplitude*np.exp(-(x-np.mean(intArray))**2 / (2*sigma**2))) # Taken from Professor To's Lecture4 ~ 19minutes 20seconds
-            results = []
-            for y in ypoints:
-                if y >= np.mean(ypoints)-2*sigma or y <= np.mean(ypoints)+2*sigma: # if x is within two standard deviations away from the mean, then we'll keep the x, otherwise we won't keep it
-                    results.append(x)
-            return 
-        '''
-        if dateArray != None:
-            resultsData, resultsDate, resultsTime = [], [], []# The results which fall within two standard deviations of the peak of the Gaussian curve
-            if (2*sigma**2) == 0: # Can't divide by zero, and therefore we'll omit the data
-                    return None, None, None
-            for x in intArray:
-                xpoints.append(x)
-                ypoints.append(Amplitude*np.exp(-(x-np.mean(intArray))**2 / (2*sigma**2)))
-            if graph: # If graph is true then we'll graph a gaussian curve
-                xpointsNp, ypointsNp = np.array(xpoints), np.array(ypoints)
-                title = 'Amplitude=' + str(Amplitude) + ' Sigma=' + str(sigma)
-                self._graphGaussian(xpointsNp, ypointsNp, title) # Will display a Gaussian curve of the data
-            for index, value in enumerate(ypoints): # Should be the same length as intArray, dateArray, and timeArray
-                if value < Amplitude+(sigma*2): # If the y value is within two standard deviations from the peak of the Gaussian curve then we will keep that data point
-                    if value > Amplitude-(sigma*2):
-                        if intArray[index] == 0 or intArray[index] == -999: # Omitting data that is zero or -999
-                            continue
-                        resultsData.append(intArray[index])
-                        resultsDate.append(dateArray[index])
-                        resultsTime.append(timeArray[index])
-            return resultsData, resultsDate, timeArray
-        else:
-            return None, None, None
-
-    def _calculatePlot(self, head, dateHead, gaussianGraph=False, month0=None, month1=None, years=None): # Calculates the data for the plots but does not draw out the graphs, useful for calculating multiple graphs before displaying the data
-        # TO DO list:
-        # Convert Time to PST from GMT
-        # Makes an empty tail end for some reason (What does that mean?)
-        data = self.aeronetData.getFormattedData() # Acquire the data # Focus on just January to March
-        timeHead = self.aeronetData.getTimeHeader()
-        dataTemp, dataDate, dataTime = [], [], []
-        for i in data: # Gaussian
-            dataTemp.append(float(data[i][head])) # header 39, 41 from the tail
-            #newTime, newDate = self._convertGMTtoPST(data[i][timeHead], data[i][dateHead])
-            #dataDate.append(newDate)
-            #dataTime.append(newTime)
-            dataDate.append(data[i][dateHead])
-            dataTime.append(data[i][timeHead])
-        #print('Data: ', dataTemp, '\nDates: ', dataDate, '\nTimes: ', dataTime)
-        #print(dataDate)
-        tempData, tempDates, tempTime = self._gaussian(dataTemp, dataDate, dataTime, gaussianGraph) # Gives three outputs
-        #currentDate = ''
-        #evening = False # NOT USED
-        xdata = [] # This will be dates
-        ydata = [] # This will be the average of value for each day
-        yDayMin = [] # This will be the minimum value for each day
-        yDayMax = [] # This will be the maximum value for each day
-        #dayRange = [] # The range of values for the day
-        #timeOfDay = [] # The time range that corresponds to the day's range values
-        dataRange = [] # The range of data from the day/night time
-        nightTime = True # For time between 6pm and 6am, otherwise daytime is between 6am to 6pm
-        if tempData == None: # Temporary(?) Bug Fix, Creating Dummy Arrays with bogus data
-            xdata.append('01:01:1970')
-            ydata.append(0)
-            yDayMin.append(0)
-            yDayMax.append(0)
-            tempNpx = np.array(xdata)
-            tempNpy = np.array(ydata)
-            tempNpYerr = np.array([yDayMin, yDayMax])
-            return tempNpx, tempNpy, tempNpYerr # Returning the dummy values since no real data was available
-        
-        for index, value in enumerate(tempData): # Compiling add data for mornings/evenings into a concise format
-            #print(dataRange)
-            #print(tempTime[index])
-            if years != None:
-                if int(tempDates[index][6:10]) < int(years):
-                    continue
-                elif int(tempDates[index][6:10]) > int(years):
-                    break
-            if month0 != None: # Checks to see if we are before the requested start month
-                if int(tempDates[index][3] + tempDates[index][4]) < int(month0): # Skip data for months prior to month0
-                    continue
-            if month1 != None: # Checks to see if we have gone beyond the requested end month
-                #print(int(tempDates[index][3] + tempDates[index][4]), int(month1))
-                if int(tempDates[index][3] + tempDates[index][4]) > int(month1): # End data calculations after month1
-                    break
-                '''
-                if years == None:
-                    if int(tempDates[index][3] + tempDates[index][4]) < int(month0): # Skip data for months prior to month0
-                        continue
-                    elif int(tempDates[index][3] + tempDates[index][4]) > int(month1): # End data calculations after month1
-                        break
-                else:
-                    if int(tempDates[index][7:10]) < int(years):
-                        continue
-                    elif int(tempDates[index][7:10]) > int(years):
-                        break
-                    if int(tempDates[index][3] + tempDates[index][4]) < int(month0): # Skip data for months prior to month0
-                        continue
-                    elif int(tempDates[index][3] + tempDates[index][4]) > int(month1): # End data calculations after month1
-                        break
-                '''
-            #print('Acceptable: ', tempDates[index])
-            # Check if the data is within a 2 day range
-            '''
-            if int(tempDate[index][0] + tempDate[index][1]) == tempDate[index-1]
-            '''
-            if nightTime: # If it was night time
-                if int(tempTime[index][0]) == 0 and int(tempTime[index][1]) <= 5 or int(tempTime[index][0]) >= 1 and int(tempTime[index][1]) >= 8: # It is still night time
-                        dataRange.append(tempData[index])
-                else: # It is no longer night time
-                    if np.sum(dataRange) != 0.0:
-                        xdata.append(tempDates[index] + '_night')
-                        ydata.append(np.sum(dataRange)/len(dataRange))
-                        yDayMin.append(self._standardDeviation(dataRange))
-                        yDayMax.append(self._standardDeviation(dataRange))
-                    dataRange.clear()
-                    nightTime = False
-            else: # If it was day time
-                if int(tempTime[index][0]) == 0 and int(tempTime[index][1]) >= 6 or int(tempTime[index][0]) == 1 and int(tempTime[index][1]) <= 7: # It is still day time
-                        dataRange.append(tempData[index])
-                else: # It is no longer day time
-                    if np.sum(dataRange) != 0.0:
-                        xdata.append(tempDates[index] + '_day')
-                        ydata.append(np.sum(dataRange)/len(dataRange))
-                        yDayMin.append(self._standardDeviation(dataRange))
-                        yDayMax.append(self._standardDeviation(dataRange))
-                    dataRange.clear()
-                    nightTime = True
-        '''
-        for index, value in enumerate(tempData): # Compiling all data for one day into a concicse format
-            if currentDate == '': # If this is the first item of data
-                currentDate = tempDates[index]
-                currentTime = tempTime[index]
-                xdata.append(tempDates[index])
-                dayRange.append(value)
-                timeOfDay.append(tempTime[index])
-                #if int(tempTime[index][0]) >= 1 and int(tempTime[index][1]) >= 8: # NOT USED
-                    #evening = True
-                #elif int(tempTime[index][0]) <= 0 and int(tempTime[index][1]) <= 5: # NOT USED
-                    #evening = False
-            elif tempDates[index] == currentDate: # For all cases with a date that matches the previous date
-                dayRange.append(value)
-                timeOfDay.append(tempTime[index])
-                #if int(tempTime[index][0]) >= 1 and int(tempTime[index][1]) >= 8: # If time is greater than 6pm (18:00 military time)
-                    #print(tempTime[index], ' is after 6pm.')
-                    #evening = True
-                #elif int(tempTime[index][0]) <= 0 and int(tempTime[index][1]) <= 5: # If time is not greater than 6pm
-                    #print(tempTime[index], ' is before 6am.')
-                    #evening = False
-            elif tempDates[index] != currentDate: # For all new dates
-                morning, evening = [], []
-                for i, v in enumerate(dayRange): # Split's the day's values into two separate data points
-                    if int(timeOfDay[i][0]) == 1 and int(timeOfDay[i][1]) >= 8: # This is evening
-                        evening.append(v)
-                    else: # All else is morning
-                        morning.append(v)
-                #print('Length of Morning Data: ', len(morning), 'Length of Evening Data: ',len(evening))
-                if len(morning) != 0: # If the length of the data is 0 we don't need to calculate it
-                    meanMorn = np.sum(morning) / len(morning)
-                    ydata.append(meanMorn)
-                    low = self._standardDeviation(morning)
-                    yDayMin.append(low)
-                    yDayMax.append(low)
-                if len(evening) != 0: # If the length of the data is 0 we don't need to calculate it
-                    meanEven = np.sum(evening) / len(evening)
-                    ydata.append(meanEven)
-                    low = self._standardDeviation(evening)
-                    yDayMin.append(low)
-                    yDayMax.append(low)
-                if len(morning) != 0 and len(evening) != 0: # If we are adding both morning and evening calculations then we need another xdata, otherwise just the initial xdata will work
-                    xdata.append(xdata[-1] + '_2')
-                #mean = np.sum(dayRange) / len(dayRange)
-                #ydata.append(mean)
-                #low = self._standardDeviation(dayRange) #self._standardDeviationPerDay(dayRange, timeOfDay) , high
-                #high = low
-                #yDayMin.append(low)#(self._standardDeviation(dayRange))#(self._rootMeanSquare(dayRange))#(-0.5+np.sqrt(np.sum(dayRange)+0.25)) #(abs(np.amin(dayRange))) # -0.5+sqrt(dayRange+0.25) # Lecture 6 at 35:00 minute mark
-                #yDayMax.append(high)#(self._standardDeviation(dayRange))#(self._rootMeanSquare(dayRange))#(0.5+np.sqrt(np.sum(dayRange)+0.25)) #(abs(np.amax(dayRange))) # 0.5+sqrt(dayRange+0.25) # Lecture 6 at 35:00 minute mark
-                dayRange.clear()
-                timeOfDay.clear()
-                if int(tempDates[index][3]) == 1 or int(tempDates[index][4]) >= 4: # Restricts the range of months; WIll not calcualate for data beyond march #This should be temporary
-                    #print('Breaking at: ', tempDates[index])
-                    break
-                xdata.append(tempDates[index]) # Adding the new day to the list of days
-                currentDate = tempDates[index]
-                if index == len(tempData)-1: # Special Case, if this is the last entry of the array and it is a different day than the previous day
-                    ydata.append(value)
-                    yDayMin.append(abs(value)) # Essentially there is no min/max
-                    yDayMax.append(abs(value)) # Essentially there is no min/max
-                    break
-                else:
-                    dayRange.append(value)
-                    timeOfDay.append(tempTime[index])
-            if index == len(tempData)-1: # If this is the last entry of the array and it is the same day as the previous day; Note: The entry's value has already been appended to the day's range
-                mean = np.sum(dayRange) / len(dayRange)
-                ydata.append(mean)
-                low, high = self._standardDeviationPerDay(dayRange, timeOfDay) 
-                yDayMin.append(low)#(self._standardDeviation(dayRange))#(self._rootMeanSquare(dayRange))#(-0.5+np.sqrt(np.sum(dayRange)+0.25)) #(abs(np.amin(dayRange))) # -0.5+sqrt(dayRange+0.25) # Lecture 6 at 35:00 minute mark
-                yDayMax.append(high)#(self._standardDeviation(dayRange))#(self._rootMeanSquare(dayRange))#(0.5+np.sqrt(np.sum(dayRange)+0.25)) #(abs(np.amax(dayRange))) # 0.5+sqrt(dayRange+0.25) # Lecture 6 at 35:00 minute mark
-                dayRange.clear()
-        '''
-        #print('Length of x: ', len(xdata), 'Length of y: ', len(ydata))
-        #print(len(xdata), len(ydata))
-        tempNpx = np.array(xdata) # The xData for the plot
-        tempNpy = np.array(ydata) # The yData for the plot
-        tempNpYerr = np.array([yDayMin, yDayMax]) # The yError Range for the plot
-        return tempNpx, tempNpy, tempNpYerr
-
-    def _graphGaussian(self, xpointsNp, ypointsNp, title): # Graphs a Gaussian curve
+    def _gaussianFilter(self, values, graph=False, head='values'): # The keep/drop mask of the Gaussian stage for a whole column at once, None if sigma is zero
+        if values.size == 0:
+            return None
+        Amplitude = np.amax(values)
+        mean = np.mean(values)
+        sigma = np.sqrt(np.mean((values - mean)**2)) * np.sqrt(2) # The root mean square spread, with sqrt(2) added in to cancel out a log 2
+        if (2*sigma**2) == 0 or Amplitude == np.amin(values): # A constant column has no spread, whatever the rounding says
+            return None
+        if graph: # If graph is true then we'll graph a gaussian curve
+            title = 'Amplitude=' + str(Amplitude) + ' Sigma=' + str(sigma)
+            self._graphGaussian(values, self._gaussianEnvelope(values, Amplitude, mean, sigma), title, head) # Will display a Gaussian curve of the data
+        return self._gaussianMask(values, Amplitude, mean, sigma)
+
+    def _calculatePlot(self, head, dateHead, gaussianGraph=False, month0=None, month1=None, years=None, blockRows=None, start=None, end=None): # Calculates the data for the plots but does not draw out the graphs, useful for calculating multiple graphs before displaying the data
+        # A plot that was already calculated comes from the plot cache, unless the Gaussian curve has to be graphed
+        # dateHead isn't needed any more, the times come from the time index; it is kept for the callers that still pass it
+        key = self._plotKey(head, month0, month1, years, start, end)
+        plot = None if gaussianGraph else self.plotCache.get(key)
+        if plot == None:
+            plot = self.plotCache.put(key, self._computePlot(head, gaussianGraph, month0, month1, years, blockRows, start, end))
+        return plot
+
+    def _plotKey(self, head, month0=None, month1=None, years=None, start=None, end=None): # What a calculated plot depends on: the file, the column, the requested time and the filter
+        number = lambda value: value if value == None or isinstance(value, np.datetime64) else int(value) # The menu passes months and years as text
+        try:
+            status = os.stat(self.filename)
+            identity = (os.path.abspath(self.filename), status.st_size, status.st_mtime_ns, len(self.aeronetData), self.aeronetData.dataOffset, self.timeZone)
+        except OSError:
+            identity = (os.path.abspath(self.filename), None, None, len(self.aeronetData), self.aeronetData.dataOffset, self.timeZone)
+        return (identity, head, number(month0), number(month1), number(years), None if start == None else str(start), None if end == None else str(end), self.filters.key())
+
+    def _cachedPlots(self, heads, query, calculate): # The plots of heads from the plot cache, calculate(missingHeads) gives the ones that aren't in it as a dict
+        plots, missing = {}, []
+        for head in dict.fromkeys(heads):
+            plots[head] = self.plotCache.get(self._plotKey(head, *query))
+            if plots[head] == None:
+                missing.append(head)
+        if len(missing) != 0:
+            for head, plot in calculate(missing).items():
+                plots[head] = self.plotCache.put(self._plotKey(head, *query), plot)
+        return plots
+
+    def _computePlot(self, head, gaussianGraph=False, month0=None, month1=None, years=None, blockRows=None, start=None, end=None): # _calculatePlot without the plot cache
+        if blockRows != None: # Stream the file in blocks of rows instead of using the loaded data
+            return self._computePlotsFromBlocks([head], month0, month1, years, blockRows, start, end)[head]
+        timeIndex = self.aeronetData.getTimeIndex() # Every row in time order
+        dataTemp = timeIndex.sortRows(np.nan_to_num(self.aeronetData.getColumn(head), nan=ColumnParser.missingValue)) # The filters expect the -999 fill value
+        if gaussianGraph:
+            self._gaussianFilter(dataTemp, gaussianGraph, head) # Only graphs the Gaussian curve, the filters decide what is kept
+        self.filters.resetReport([head])
+        keep, usable = self.filters.evaluate([head], dataTemp[None], timeIndex.mask(month0, month1, years, start, end), self._rowMasks(timeIndex)) # Only the requested months/years
+        if not usable[0]: # Temporary(?) Bug Fix, Creating Dummy Arrays with bogus data
+            return self._emptyPlot() # Returning the dummy values since no real data was available
+        keptRows = np.flatnonzero(keep[0])
+        buckets = HalfDayBins.group(HalfDayBins.bucketIds(timeIndex.stamps[keptRows]), dataTemp[keptRows]) # Compiling all data for mornings/evenings into a concise format
+        return self._halfDayPlot(*buckets)
+
+    def _rowMasks(self, timeIndex): # The masks of the cross column filters, in time order
+        return self.filters.rowMasks(lambda head: timeIndex.sortRows(self.aeronetData.getColumn(head)))
+
+    def _calculatePlots(self, heads, month0=None, month1=None, years=None, start=None, end=None): # _calculatePlot for many heads at once, the columns are filtered and grouped together as one matrix
+        heads = list(dict.fromkeys(heads))
+        if len(heads) == 0:
+            return {}
+        timeIndex = self.aeronetData.getTimeIndex() # Every row in time order, shared by all of the columns
+        inRange = timeIndex.mask(month0, month1, years, start, end)
+        return self._cachedPlots(heads, (month0, month1, years, start, end), lambda missing: dict(zip(missing, self._calculatePlotsOfMatrix(self._plotMatrix(missing, timeIndex), timeIndex.stamps, inRange, missing, self.filters, self._rowMasks(timeIndex)))))
+
+    def _plotMatrix(self, heads, timeIndex, matrix=None): # The columns in time order as the rows of one matrix, with the -999 fill value the Gaussian stage expects; matrix is where to put them
+        if matrix is None:
+            matrix = np.empty((len(heads), len(timeIndex))) # One contiguous row of the matrix per column, so every reduction runs along memory
+        for index, head in enumerate(heads):
+            matrix[index] = timeIndex.sortRows(self.aeronetData.getColumn(head))
+        matrix[np.isnan(matrix)] = ColumnParser.missingValue
+        return matrix
+
+    def _calculatePlotsOfMatrix(self, matrix, stamps, inRange, heads=None, pipeline=None, rowMasks=()): # The plot of every row of a (column x time) matrix, whose times are the sorted stamps and inRange the rows requested
+        # The rows are filtered by pipeline (by default the Gaussian stage), whose report is kept under heads; rowMasks are the masks of its cross column filters
+        results = []
+        if pipeline == None:
+            pipeline = FilterPipeline()
+        if heads == None:
+            heads = list(range(matrix.shape[0]))
+        pipeline.resetReport(heads)
+        keep, usable = pipeline.evaluate(heads, matrix, inRange, rowMasks)
+        # The half-days, bucketed once for every column; the rows are in time order so every half-day is a run of rows
+        keys, starts = np.unique(HalfDayBins.bucketIds(stamps), return_index=True)
+        labels = HalfDayBins.labels(keys)
+        if keys.size != 0:
+            inverse = np.repeat(np.arange(keys.size), np.diff(np.append(starts, stamps.size)))
+            count = np.add.reduceat(keep, starts, axis=1, dtype=np.int64)
+            means = np.add.reduceat(np.where(keep, matrix, 0.0), starts, axis=1)/np.maximum(count, 1)
+            squares = np.add.reduceat(np.where(keep, (matrix - means[:, inverse])**2, 0.0), starts, axis=1)
+        for index in range(matrix.shape[0]):
+            if not usable[index]:
+                results.append(self._emptyPlot()) # Returning the dummy values since no real data was available
+                continue
+            present = count[index] > 0
+            results.append(self._halfDayPlot(keys[present], count[index, present], means[index, present], squares[index, present], labels[present]))
+        return results
+
+    def _batchFit(self, yDataArray, degree=None): # The least squares polynomial fit of every plot against its index, solved together; see LeastSquaresFit.fit
+        return LeastSquaresFit.fit(yDataArray, self.fitDegree if degree == None else degree)
+
+    def _calculatePlotsFromBlocks(self, heads, month0=None, month1=None, years=None, blockRows=100000, start=None, end=None): # Calculates the plots of several heads while streaming the file, only one block of rows is held in memory at a time
+        return self._cachedPlots(heads, (month0, month1, years, start, end), lambda missing: self._computePlotsFromBlocks(missing, month0, month1, years, blockRows, start, end))
+
+    def _computePlotsFromBlocks(self, heads, month0=None, month1=None, years=None, blockRows=100000, start=None, end=None): # _calculatePlotsFromBlocks without the plot cache
+        # First pass, the moments (count, mean, deviation, minimum and maximum) every column's filters are fitted to and the time span of the file
+        stats = {head: OnlineStats() for head in heads} # count, mean, sum of squared differences, minimum and maximum
+        first, last = None, None
+        for columns in self.readDataInBlocks(self.filename, blockRows):
+            stamps = self.aeronetData.localize(ColumnParser.parseDateTime(columns[self.aeronetData.getDateHeader()], columns[self.aeronetData.getTimeHeader()]), columns)
+            if stamps.size != 0:
+                first = np.amin(stamps) if first is None else min(first, np.amin(stamps))
+                last = np.amax(stamps) if last is None else max(last, np.amax(stamps))
+            for head in heads:
+                stats[head].add(np.nan_to_num(columns[head], nan=ColumnParser.missingValue))
+        # Second pass, filter every block and group it into mornings/evenings
+        results, buckets, parameters = {}, {}, {}
+        for head in heads:
+            parameters[head] = self.filters.fitMoments(*stats[head].get())
+            if not all(np.all(usable) for _, usable in parameters[head]): # Can't divide by zero, and therefore we'll omit the data
+                results[head] = self._emptyPlot()
+            else:
+                buckets[head] = OnlineStats() # The half-days of every block so far
+        self.filters.resetReport(heads)
+        windowStarts, windowEnds = TimeIndex.windows(month0, month1, years, start, end, first, last) # The requested months/years
+        if len(buckets) != 0 and windowStarts.size != 0:
+            for columns in self.readDataInBlocks(self.filename, blockRows):
+                stamps = self.aeronetData.localize(ColumnParser.parseDateTime(columns[self.aeronetData.getDateHeader()], columns[self.aeronetData.getTimeHeader()]), columns)
+                inRange = TimeIndex.contains(stamps, windowStarts, windowEnds)
+                bucketIds = HalfDayBins.bucketIds(stamps)
+                rowMasks = self.filters.rowMasks(lambda head: columns[head])
+                for head in buckets:
+                    values = np.nan_to_num(columns[head], nan=ColumnParser.missingValue)
+                    keep = self.filters.evaluate([head], values[None], inRange, rowMasks, parameters[head])[0][0]
+                    buckets[head].add(values[keep], bucketIds[keep])
+        for head, halfDays in buckets.items():
+            results[head] = self._halfDayPlot(*halfDays.groups()[:4])
+        return results
+
+    def _gaussianEnvelope(self, values, Amplitude, mean, sigma):
+        return GaussianFilter.envelope(values, Amplitude, mean, sigma)
+
+    def _gaussianMask(self, values, Amplitude, mean, sigma): # Returns which values fall within two standard deviations of the peak of the Gaussian curve, omitting zero and -999
+        return GaussianFilter().apply(values, (Amplitude, mean, sigma))
+
+    def _emptyPlot(self): # Dummy arrays with bogus data for plots without any usable data
+        return np.array(['01:01:1970']), np.array([0]), np.array([[0], [0]])
+
+    def _halfDayPlot(self, keys, count, mean, squares, labels=None): # The plot of the half-day groups: their labels, means, and error bars of the standard deviation (times sqrt(2), as the Gaussian stage takes it)
+        if keys.size == 0:
+            return np.array([], dtype=str), np.array([]), np.empty((2, 0))
+        deviation = np.sqrt(squares/count) * np.sqrt(2)
+        return HalfDayBins.labels(keys) if labels is None else labels, mean, np.array([deviation, deviation])
+
+    def _graphGaussian(self, xpointsNp, ypointsNp, title, head='values'): # Graphs a Gaussian curve
+        figure = plt.figure() # Not on a plot template that is still open
         plt.plot(xpointsNp, ypointsNp,'ko')
         plt.title(title)
-        plt.get_current_fig_manager().set_window_title(title)
-        plt.show()
+        self._showFigure(title, head + '_gaussian', figure)
+
+    def _decimatePlot(self, times, y, yErr, axes): # The points of a plot that are drawn on axes and their error bars, see Decimation.decimate
+        width = self.decimationWidth
+        if width == None: # The axes' share of the 1280 pixels wide window or file
+            width = int(axes.get_position().width*1280)
+        return Decimation.decimate(times.astype('datetime64[s]').astype(np.int64), y, yErr, max(width, 1), self.decimation)
+
+    def _dateAxis(self, axis, times): # Places the x ticks of a time axis and returns its name, see PlotTemplate.dateAxis
+        return PlotTemplate.dateAxis(axis, times)
 
-    def _drawplot(self, head, xData, yData, tempNpYerr):
+    def _plotTemplate(self, rows=1, columns=1): # The figure with rows x columns axes that plots are drawn on, made again only once its window has been closed
+        template = self.plotTemplates.get((rows, columns))
+        if template == None or not template.isOpen():
+            template = PlotTemplate(rows, columns)
+            self.plotTemplates[(rows, columns)] = template
+        return template
+
+    def _showFigure(self, windowTitle, name, figure=None, keep=False): # Shows a figure (the current one by default) in a window, or saves it in every output format when there is an output directory and closes it unless keep
+        if figure == None:
+            figure = plt.gcf()
+        if self.outputDirectory == None:
+            figure.canvas.manager.set_window_title(windowTitle)
+            figure.canvas.manager.resize(1280, 720)
+            plt.show()
+            return
+        figure.set_size_inches(12.8, 7.2) # The 1280x720 of the window
+        for extension in self.outputFormats:
+            figure.savefig(self.outputPath(name, extension), dpi=100)
+        if not keep:
+            plt.close(figure)
+
+    def _fittedPlot(self, xData, yData, tempNpYerr, fit, axes): # The times, the fitted curve and the error bars of a plot as they are drawn on axes
+        if fit == None:
+            fit = self._batchFit([yData])[0]
+        coefficients, residuals, rSquared = fit
+        xTimes = HalfDayBins.times(xData) # The middle of every half-day, the x axis is drawn in time
+        yFit = LeastSquaresFit.evaluate(coefficients, np.arange(len(xData)))
+        kept, yErr = self._decimatePlot(xTimes, yFit, tempNpYerr, axes) # Only about as many points as there are pixels are drawn
+        return xTimes[kept], yFit[kept], yErr
+
+    def _drawplot(self, head, xData, yData, tempNpYerr, fit=None): # fit is the (coefficients, residuals, rSquared) of the curve fit if it was already calculated
         # To-Do: (DONE)
             # Place horizontal bars on the error bars too
             # Place tick marks at the 1st and 15th of each month # Use the numerical day of the year
             # Use the root mean square to calculate the average for each day, use Gaussian for the overall data
         if len(xData) == 0: # If there is no xData, we will not attempt to create a graph
             return False
-        months = ['Jan.', 'Feb.', 'Mar.', 'Apr.', 'May.', 'Jun.', 'Jul.', 'Aug.', 'Sep.', 'Oct.', 'Nov.', 'Dec.'] # Used for tick labels
-        count = 0
-        previousCount = 1 # Start off with zero since we will be subtracting 1 from this at each new tickRange/Label and we want to include the first day
-        tickRange = [] # The break points for our xaxis
-        tickLabels = [] # The months that the break points will be using
-        years = [] # A list of years that the data covers
-        currentMonth = str(xData[0][3]) + str(xData[0][4])
-        for index, day in enumerate(xData): # To make the break points (tickRange) for the months
-            count += 1
-            if day[4] != currentMonth[1]: # Any day where the month changes
-                tickRange.append(previousCount-1) # Start of the month
-                tickRange.append(previousCount + ((count - previousCount)/2)) # Middle of the month
-                if currentMonth[0] == '0':
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount-1][0]) + str(xData[previousCount-1][1])) # Start of the month
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount + ((count - previousCount)//2)][0]) + str(xData[previousCount + ((count - previousCount)//2)][1])) # Middle of the month
-                else:
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount-1][0]) + str(xData[previousCount-1][1])) # Start of the month
-                    tickLabels.append(months[eval(currentMonth)-1] + str(xData[previousCount + ((count - previousCount)//2)][0]) + str(xData[previousCount + ((count - previousCount)//2)][1])) # Middle of the month
-                currentMonth = str(day[3] + day[4])
-                previousCount = count
-            if index == len(xData) - 1: # The last day in the data list
-                tickRange.append(previousCount-1) # Start of the month
-                tickRange.append(previousCount + ((count - previousCount)/2)) # Middle of the month
-                if currentMonth[0] == '0':
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount-1][0]) + str(xData[previousCount-1][1])) # Start of the month
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount + (len(xData) - previousCount) // 2][0]) + str(xData[previousCount + (len(xData) - previousCount) // 2][1])) # Middle of the month
-                else:
-                    tickLabels.append(months[eval(currentMonth[1])-1] + str(xData[previousCount-1][0]) + str(xData[previousCount-1][1])) # Start of the month
-                    tickLabels.append(months[eval(currentMonth)-1] + str(xData[previousCount + (len(xData) - previousCount) // 2][0]) + str(xData[previousCount + (len(xData) - previousCount) // 2][1])) # Middle of the month
-                previousCount = count
-            if str(day[6] + day[7] + day[8] + day[9]) not in years:
-                years.append(str(day[6] + day[7] + day[8] + day[9]))
         windowTitle = head + ' with ' + str(len(xData)) + ' data points'
-        xaxisName = 'Months' #'Date dd:mm:yyyy'
-        if 'nm' in head:
-            yaxisName = 'Wavelength(nm)'
-        elif 'µm' in head:
-            yaxisName = 'Wavelength(µm)'
-        elif 'cm' in head:
-            yaxisName = 'Wavelength(cm)'
-        elif 'hPa' in head:
-            yaxisName = 'Pressure(hPa)'
-        elif 'degrees_c' in head.lower():
-            yaxisName = 'Celsius(°C)'
-        elif 'angle' in head.lower():
-            yaxisName = 'Angle(°)'
-        elif 'longitude' in head.lower():
-            yaxisName = 'Longitude(λ)'
-        elif 'latitude' in head.lower():
-            yaxisName = 'Latitude(Φ)'
-        elif 'wavelength' in head.lower():
-            yaxisName = 'Wavelength'
-        else:
-            yaxisName = ''
-        if len(years) == 1: # If only one year was detected
-            xaxisName = xaxisName + ' in ' + years[0]
-        elif len(years) != 0: # Functionality for data with more than one year
-            xaxisName = xaxisName + ' in ('
-            for i in years:
-                if i != years[-1]:
-                    xaxisName = xaxisName + i + ', '
-                elif i == years[len(years)-1]:
-                    xaxisName = xaxisName + i + ')'
-        cap = 2 # used for setting the cap sizes for the error bars
-        #yDataFit = self._chiSquared(xData, yData)
-        xData_poly = []
-        for i, _ in enumerate(xData):
-            xData_poly.append(i)
-        '''
-        degree= 8
-        z = np.polynomial.Polynomial.fit(xData_poly, yData, degree)
-        print(z)
-        f = np.polynomial.Polynomial(z)
-        xData_new = np.linspace(xData_poly[0], xData_poly[-1], len(xData))
-        yData_new = f(xData_new)
-        print('lengths: ', len(xData_new), len(yData_new))
-        '''
-        coeff, covariance = sp.optimize.curve_fit(self._myCurve_Polynomial, xData_poly, yData)
-        '''
-        print(coeff)
-        yFit = self._myCurve_Polynomial(xData_poly, coeff[0], coeff[1], coeff[2], coeff[3], coeff[4], coeff[5])
-        ssTot = np.sum((yData - np.mean(yData))**2)
-        ssRes = np.sum((yData - yFit)**2)
-        r2 = 1 - (ssRes/ssTot)
-        print("R Squared: ", r2)
-        '''
-        #plt.plot(xData, yData, 'o', xData_new, yData_new)
-        #print('lengths: ', len(xData_new), len(yData_new))
-        #plt.errorbar(xData_new, yData_new, yerr=tempNpYerr, fmt='o', color='black', capsize=cap)
-        #print(xData, '\n', yData, '\n', tickRange, '\n', tickLabels, '\n', len(xData), len(yData), len(tickRange), len(tickLabels))
-        #plt.subplot(2,1)
-        plt.errorbar(xData_poly, self._myCurve_Polynomial(xData_poly, coeff[0], coeff[1], coeff[2], coeff[3]), yerr=tempNpYerr, fmt='o', color='black', capsize=cap, markersize=3)
-        plt.title(head)
-        plt.xlabel(xaxisName)
-        plt.ylabel(yaxisName)
-        if len(tickRange) == len(tickLabels): # If for some reason the range is not in equal length to the labels, we won't do anything special to them
-            plt.xticks(ticks = tickRange, labels = tickLabels, minor=False)
-        plt.get_current_fig_manager().set_window_title(windowTitle)
-        plt.get_current_fig_manager().resize(1280, 720)
-        plt.show()
+        template = self._plotTemplate() # The figure and its styling are made once, only the data is swapped
+        xTimes, yFit, yErr = self._fittedPlot(xData, yData, tempNpYerr, fit, template.axes[0])
+        template.draw(0, head, xTimes, yFit, yErr)
+        self._showFigure(windowTitle, head, template.figure, keep=True)
         return True # Successfully drawn
+
+    def _drawGrid(self, heads, xDataArray, yDataArray, yErrArray, fits=None, perFigure=12): # Draws the plots as small multiples, perFigure of them on every figure; returns how many were drawn
+        if fits == None:
+            fits = self._batchFit(yDataArray)
+        count = 0
+        for first in range(0, len(heads), perFigure):
+            page = range(first, min(first + perFigure, len(heads)))
+            columns = math.ceil(math.sqrt(len(page)))
+            template = self._plotTemplate(math.ceil(len(page)/columns), columns)
+            for panel, index in enumerate(page):
+                template.draw(panel, heads[index], *self._fittedPlot(xDataArray[index], yDataArray[index], yErrArray[index], fits[index], template.axes[panel]), compact=True)
+            template.hide(len(page))
+            windowTitle = heads[page[0]] + ' to ' + heads[page[-1]] if len(page) > 1 else heads[page[0]]
+            self._showFigure(windowTitle, 'grid_' + heads[page[0]] + '_' + str(len(page)), template.figure, keep=True)
+            count += len(page)
+        return count
 # end Analysis
 
 class dataContainer:
+    __slots__ = ('version', 'location', 'AODLevel', 'description', 'contactInfo', 'reference', 'header', 'dateHeader', 'timeHeader',
+                 'rawData', 'rawBlock', 'blockLayout', 'dataLength', 'columns', 'numericColumns', 'values', 'valueRows', 'validity',
+                 'rowTimes', 'timeZone', 'localTimes', 'timeIndex', 'dataOffset', 'formattedHeader', 'precision', 'packedRows', 'dataStart',
+                 'rawSource', 'cacheWriter', 'buffers')
+
     def __init__(self):
         self.version = ''
         self.location = ''
@@ -605,9 +864,26 @@ class dataContainer:
         self.dateHeader = ''
         self.timeHeader = ''
         self.rawData = []
+        self.rawBlock = b'' # All of the data lines as a single block of bytes, which the columns are decoded from
+        self.blockLayout = None # Where the lines and fields of rawBlock are
         self.dataLength = 0
-        self.constructedData = {}
+        self.columns = {} # One typed numpy column per header, each is decoded from rawBlock the first time it is requested
+        self.numericColumns = [] # Whether each header holds numbers or strings
+        self.values = None # Once compacted, every numeric column as one contiguous row of a single array
+        self.valueRows = {} # The row of values that holds each numeric header
+        self.validity = None # Bit mask (packed with np.packbits) of which entries of values hold a measurement
+        self.rowTimes = None # The date and time of every row, parsed the first time it is requested
+        self.timeZone = None # What the rows' times are converted to, see setTimeZone
+        self.localTimes = None # The rows' times in timeZone, converted the first time they are requested
+        self.timeIndex = None # The rows' local times in sorted order
+        self.dataOffset = None # Where in the file the data that has been read ends
         self.formattedHeader = []
+        self.precision = None # Set by compact, the dtype of values
+        self.packedRows = {} # The row of values that each numeric header goes into once it is decoded
+        self.dataStart = None # Where in the file the data lines start
+        self.rawSource = None # (filename, start, end) of the data lines when the raw text is read from the file only if a column needs it
+        self.cacheWriter = None # (ParsedFileCache, filename) that every newly decoded column is saved to
+        self.buffers = {} # The arrays with room to spare that appended columns are views of, by header (None for rowTimes)
     
     def __del__(self):
         self.clear()
@@ -621,9 +897,24 @@ class dataContainer:
         del self.dateHeader
         del self.timeHeader
         del self.rawData
+        del self.rawBlock
+        del self.blockLayout
         del self.dataLength
-        del self.constructedData
+        del self.columns
+        del self.numericColumns
+        del self.values
+        del self.valueRows
+        del self.validity
+        del self.rowTimes
+        del self.timeIndex
+        del self.dataOffset
         del self.formattedHeader
+        del self.precision
+        del self.packedRows
+        del self.dataStart
+        del self.rawSource
+        del self.cacheWriter
+        del self.buffers
 
     def __len__(self):
         return self.dataLength
@@ -638,13 +929,26 @@ class dataContainer:
         information += self.reference + '\n'
         information += self.header + '\n'
         #information += 'Quantity of data: ' + str(self.dataLength) + '\n' # Not a part of the original data
+        rows = self.getRawLines()
+        if len(rows) != self.dataLength: # The raw lines weren't kept (e.g. the data came from the cache) so they are rebuilt from the columns
+            rows = self._rowsAsText()
         for i in range(0, self.dataLength):
             if i == self.dataLength:
-                information += self.rawData[i] # change to formatted data
+                information += rows[i] # change to formatted data
             else:
-                information += self.rawData[i] + '\n' # change to formatted data
+                information += rows[i] + '\n' # change to formatted data
         return information
 
+    def _rowsAsText(self): # Rebuilds the comma separated data lines from the columns, missing values are written as -999
+        text = None
+        for head in self.formattedHeader:
+            column = self.getColumn(head)
+            if column.dtype.kind == 'f':
+                column = np.where(np.isnan(column), ColumnParser.missingValue, column)
+            column = np.asarray(column).astype(str)
+            text = column if text is None else np.char.add(np.char.add(text, ','), column)
+        return [] if text is None else text.tolist()
+
     def __getitem__(self): # Not Implemented, Might not need
         pass
 
@@ -676,38 +980,39 @@ class dataContainer:
         self.rawData.append(inputInfo)
         self.dataLength += 1
 
-    def formatData(self):
-        keys = []
-        key = ''
-        count = 0
-        for c in self.header: # Parse header first
-            if c != ',':
-                key += c
-            else:
-                keys.append(key)
-                key = ''
-        keys.append(key) # Append the last key
-        key = ''
-        self.formattedHeader = keys
-        for data in self.rawData: # Parse thru the list of data
-            temp = {}
-            values = []
-            value = ''
-            for c in data: # Parse thru each string of data
-                if c != ',':
-                    value += c
-                else:
-                    values.append(value)
-                    value = ''
-            values.append(value) # Append the last value
-            value = ''
-            for i in keys:
-                for k in values:
-                    temp[i] = k
-                    values.remove(k)
-                    break
-            self.constructedData[count] = temp
-            count += 1
+    def setRawData(self, inputInfo): # Sets all of the data lines at once, as read from the file
+        if isinstance(inputInfo, str):
+            inputInfo = inputInfo.encode()
+        self.rawData = []
+        self.rawBlock = ColumnParser.dropBlankLines(inputInfo)
+
+    def getRawLines(self):
+        if len(self.rawData) != 0:
+            return self.rawData
+        return self.rawBlock.decode().splitlines()
+
+    def formatData(self): # Prepares the raw lines to be decoded into one typed numpy column per header, the columns themselves are decoded when requested
+        self.formatHeader()
+        if len(self.rawData) != 0: # Joins the lines into a single block
+            lines = [line.rstrip('\r\n') for line in self.rawData if line.strip() != '']
+            self.rawBlock = '\n'.join(lines).encode()
+            self.rawData = []
+        if self.rawBlock.strip() == b'':
+            self.rawBlock = b''
+        elif not self.rawBlock.endswith(b'\n'):
+            self.rawBlock += b'\n'
+        self.dataLength = self.rawBlock.count(b'\n')
+        self.columns = {}
+        self.buffers = {}
+        self.blockLayout = None
+        self.rowTimes = None
+        self.localTimes = None
+        self.timeIndex = None
+        if self.dataLength != 0:
+            self.numericColumns = ColumnParser.numericColumns(self.rawBlock[:self.rawBlock.index(b'\n')].decode(), self.formattedHeader)
+
+    def formatHeader(self): # Splits the header line into the list of headers
+        self.formattedHeader = ColumnParser.splitHeader(self.header)
         for head in self.formattedHeader: # Acquire the date and time header for future and easier acquisition
             if 'dd:mm:yyyy' in head:
                 self.dateHeader = head
@@ -722,8 +1027,222 @@ class dataContainer:
     def getFormattedHeader(self):
         return self.formattedHeader
 
-    def getFormattedData(self):
-        return self.constructedData
+    def setColumns(self, columns, rowTimes, dataLength): # Sets already parsed columns, the header needs to be set first
+        self.formatHeader()
+        self.columns = columns
+        self.buffers = {}
+        self.rowTimes = rowTimes
+        self.localTimes = None
+        self.timeIndex = None
+        self.dataLength = dataLength
+
+    def getFormattedData(self): # Returns every column, decoding the ones not yet requested
+        for head in self.formattedHeader:
+            self.getColumn(head)
+        return self.columns
+
+    def getColumn(self, head): # Returns a single column, decoding it on its first request
+        if head not in self.columns:
+            index = self.formattedHeader.index(head)
+            if self.dataLength == 0:
+                self.columns[head] = np.empty(0)
+            else:
+                if len(self.rawBlock) == 0 and self.rawSource != None: # The raw text was left in the file
+                    self.readRawSource()
+                if self.blockLayout == None: # Where the fields of every line are, found once and shared by all columns
+                    self.blockLayout = ColumnParser.blockLayout(self.rawBlock)
+                self.columns[head] = ColumnParser.parseColumn(self.rawBlock, index, self.numericColumns[index], self.blockLayout)
+            if self.cacheWriter != None:
+                self.cacheWriter[0].saveColumn(self.cacheWriter[1], self, head)
+            self._pack(head)
+            if self.precision != None and len(self.columns) == len(set(self.formattedHeader)): # Compacted and nothing is left to decode
+                self._dropRaw()
+        elif head in self.packedRows and head not in self.valueRows: # Mapped from the cache
+            self._pack(head)
+        return self.columns[head]
+
+    def readRawSource(self): # Reads the data lines back from the file, for a container filled from the cache
+        filename, start, end = self.rawSource
+        with open(filename, 'rb') as dataFile:
+            dataFile.seek(start)
+            self.setRawData(dataFile.read(end - start))
+        if len(self.rawBlock) != 0 and not self.rawBlock.endswith(b'\n'):
+            self.rawBlock += b'\n'
+        if self.rawBlock.count(b'\n') != self.dataLength:
+            self.rawBlock = b''
+            raise ValueError(filename + ' changed since it was read, read it again')
+
+    def compact(self, precision=np.float64): # Packs the numeric columns into one array of the given precision, each column as soon as it is decoded; the raw text is dropped once every column is
+        # Columns mapped from the cache stay mapped, unless they are in another precision; then they are packed when first requested
+        numeric = [head for head in dict.fromkeys(self.formattedHeader) if self.isNumeric(head)]
+        self.precision = precision
+        self.values = np.empty((len(numeric), self.dataLength), dtype=precision) # One contiguous row per column
+        self.validity = np.zeros((len(numeric), (self.dataLength + 7)//8), dtype=np.uint8)
+        self.packedRows = {head: row for row, head in enumerate(numeric)}
+        self.valueRows = {}
+        for head in list(self.columns):
+            if not isinstance(self.columns[head], np.memmap):
+                self._pack(head)
+        if len(self.columns) == len(set(self.formattedHeader)):
+            self._dropRaw()
+
+    def _pack(self, head, keepMapped=True): # Moves a decoded numeric column into its row of values
+        row = self.packedRows.get(head)
+        if row == None or head in self.valueRows:
+            return
+        if keepMapped and isinstance(self.columns[head], np.memmap) and self.columns[head].dtype == self.precision: # Read from the cache file as it is needed
+            return
+        self.values[row, :self.dataLength] = self.columns[head]
+        self.validity[row, :(self.dataLength + 7)//8] = np.packbits(~np.isnan(self.values[row, :self.dataLength]))
+        self.valueRows[head] = row
+        self.columns[head] = self.values[row, :self.dataLength]
+
+    def _dropRaw(self):
+        self.rawData = []
+        self.rawBlock = b''
+        self.blockLayout = None
+        self.rawSource = None
+
+    def appendBlock(self, block): # Adds the complete lines of a block of bytes to the end of the data, returns the new rows' columns
+        if isinstance(block, str):
+            block = block.encode()
+        block = ColumnParser.dropBlankLines(block)
+        if block.strip() == b'':
+            return {head: np.empty(0) for head in self.formattedHeader}
+        if len(self.numericColumns) != len(self.formattedHeader): # No rows were read before, the first new one decides which columns are numeric
+            self.numericColumns = ColumnParser.numericColumns(block[:block.find(b'\n') if b'\n' in block else len(block)].decode(), self.formattedHeader)
+        added = ColumnParser.parseBlock(block, self.formattedHeader, self.numericColumns) # Typed as the columns already read
+        rows = len(next(iter(added.values()), []))
+        self.cacheWriter = None # The cache only holds what was read from the file
+        self.getFormattedData() # Everything has to be decoded before it can be extended
+        self.rawSource = None
+        for head in self.packedRows: # The new rows go after the packed ones, mapped columns too
+            self._pack(head, keepMapped=False)
+        length, end = self.dataLength, self.dataLength + rows
+        if length == 0: # Nothing was read before, the new rows decide the types of the columns
+            self.columns = dict(added)
+            self.dataLength = end
+            self.rowTimes = None
+            if self.precision != None:
+                self.compact(self.precision)
+        else:
+            for head, column in added.items():
+                if head not in self.valueRows:
+                    self.buffers[head] = dataContainer._extended(self.buffers.get(head, self.columns[head]), length, column)
+                    self.columns[head] = self.buffers[head][:end]
+            if self.precision != None and len(self.packedRows) != 0: # The new rows go into the spare room of the compact array
+                packed = sorted(self.packedRows, key=self.packedRows.get)
+                self.values = dataContainer._extended(self.values, length, np.array([added[head] for head in packed], dtype=self.precision))
+                first = length//8 # The last, partly filled, byte of the mask is packed again
+                self.validity = dataContainer._extended(self.validity, first, np.packbits(~np.isnan(self.values[:, first*8:end]), axis=1))
+                for head in packed:
+                    self.columns[head] = self.values[self.packedRows[head], :end]
+        if self.rowTimes is not None:
+            self.buffers[None] = dataContainer._extended(self.buffers.get(None, self.rowTimes), length, ColumnParser.parseDateTime(added[self.dateHeader], added[self.timeHeader]))
+            self.rowTimes = self.buffers[None][:end]
+        self.localTimes = None
+        self.timeIndex = None
+        self.dataLength = end
+        if len(self.rawBlock) != 0: # The raw text was kept
+            self.rawBlock += block if block.endswith(b'\n') else block + b'\n'
+            self.blockLayout = None
+        return added
+
+    @staticmethod
+    def _extended(buffer, length, added): # buffer, whose first length entries along the last axis are in use, with added after them
+        # A full buffer is replaced by one twice the size, so a series of appends copies each row only a few times
+        end = length + added.shape[-1]
+        dtype = buffer.dtype if buffer.dtype.kind == 'f' else np.result_type(buffer, added) # Strings may need to be wider
+        if buffer.shape[-1] < end or dtype != buffer.dtype or not buffer.flags.writeable:
+            grown = np.empty(buffer.shape[:-1] + (max(end, 2*buffer.shape[-1]),), dtype=dtype)
+            grown[..., :length] = buffer[..., :length]
+            buffer = grown
+        buffer[..., length:end] = added
+        return buffer
+
+    def isNumeric(self, head): # Whether a column holds numbers, as far as is known without decoding it
+        if head in self.columns:
+            return self.columns[head].dtype.kind == 'f'
+        if head in self.formattedHeader and len(self.numericColumns) == len(self.formattedHeader):
+            return self.numericColumns[self.formattedHeader.index(head)]
+        return True
+
+    def getLocation(self):
+        return self.location
+
+    def getProduct(self):
+        return dataContainer.productOf(self.AODLevel)
+
+    @staticmethod
+    def productOf(line): # 'AOD', 'SDA' or 'INV', from the line that states the version and level
+        if 'SDA' in line:
+            return 'SDA'
+        if 'Inversion' in line or 'Almucantar' in line or 'Hybrid' in line:
+            return 'INV'
+        return 'AOD'
+
+    def getSizeBins(self): # The headers of the inversion's size distribution, which are the bin radii in um
+        return [head for head in self.formattedHeader if ColumnParser.isNumeric(head)]
+
+    def getSizeDistribution(self): # The radii of the size distribution bins, and the distribution itself as a (time x bin) array in the order of the file
+        bins = self.getSizeBins()
+        radii = np.array([float(head) for head in bins])
+        if len(bins) == 0:
+            return radii, np.empty((self.dataLength, 0))
+        rows = [self.valueRows.get(head) for head in bins]
+        if rows[0] != None and rows == list(range(rows[0], rows[0] + len(rows))): # Already side by side in the compact array
+            return radii, self.values[rows[0]:rows[0] + len(rows), :self.dataLength].T
+        return radii, np.column_stack([self.getColumn(head) for head in bins])
+
+    def getValidity(self, head): # Which rows of a column hold a measurement
+        if head in self.valueRows:
+            return np.unpackbits(self.validity[self.valueRows[head]], count=self.dataLength).astype(bool)
+        column = self.getColumn(head)
+        if column.dtype.kind == 'f':
+            return ~np.isnan(column)
+        return np.ones(len(column), dtype=bool)
+
+    def getRowTimes(self): # The datetime64 of every row, in the order of the file
+        if self.rowTimes is None:
+            if self.dateHeader != '' and self.timeHeader != '':
+                self.rowTimes = ColumnParser.parseDateTime(self.getColumn(self.dateHeader), self.getColumn(self.timeHeader))
+                if self.cacheWriter != None: # Parsed once, a warm load maps them
+                    self.cacheWriter[0].saveRowTimes(self.cacheWriter[1], self)
+            else:
+                self.rowTimes = np.empty(0, dtype='datetime64[s]')
+        return self.rowTimes
+
+    def setTimeZone(self, zone): # An IANA timezone name, 'longitude' for the nominal timezone of the site's longitude, or None for UTC
+        self.timeZone = zone
+        self.localTimes = None
+        self.timeIndex = None
+
+    def getTimeZone(self):
+        return self.timeZone
+
+    def getLongitudeHeader(self):
+        return next((head for head in self.formattedHeader if 'longitude' in head.lower()), '')
+
+    def localize(self, times, columns=None): # UTC times in the timezone, columns (header -> values) holds the longitude of rows that aren't loaded
+        if self.timeZone == None:
+            return times
+        longitudes = None
+        if self.timeZone == 'longitude':
+            head = self.getLongitudeHeader()
+            if head == '':
+                raise ValueError('There is no longitude column to take the timezone from')
+            longitudes = columns[head] if columns != None else self.getColumn(head)
+        return LocalTime.convert(times, self.timeZone, longitudes)
+
+    def getLocalTimes(self): # The datetime64 of every row in the timezone, in the order of the file
+        if self.localTimes is None:
+            self.localTimes = self.localize(self.getRowTimes())
+        return self.localTimes
+
+    def getTimeIndex(self): # The rows' local times sorted, for finding ranges of time
+        if self.timeIndex is None:
+            self.timeIndex = TimeIndex(self.getLocalTimes())
+        return self.timeIndex
 
     def getDateHeader(self):
         return self.dateHeader
@@ -741,12 +1260,1356 @@ class dataContainer:
         self.header = ''
         self.dateHeader = ''
         self.timeHeader = ''
-        self.rawData.clear()
+        self.rawData = []
+        self.rawBlock = b''
+        self.blockLayout = None
         self.dataLength = 0
-        self.constructedData.clear()
-        self.formattedHeader.clear()
+        self.columns = {}
+        self.numericColumns = []
+        self.values = None
+        self.valueRows = {}
+        self.validity = None
+        self.rowTimes = None
+        self.timeZone = None
+        self.localTimes = None
+        self.timeIndex = None
+        self.dataOffset = None
+        self.formattedHeader = []
+        self.precision = None
+        self.packedRows = {}
+        self.dataStart = None
+        self.rawSource = None
+        self.cacheWriter = None
+        self.buffers = {}
 # end dataInformation
 
+class ColumnParser: # Vectorized parser that turns the data lines of an aeronet file into one typed numpy column per header
+    missingValue = -999.0 # The value aeronet uses for missing measurements, stored as NaN once parsed
+
+    @staticmethod
+    def splitHeader(line): # Returns the list of headers from the header line
+        return line.strip().split(',')
+
+    @staticmethod
+    def isNumeric(value):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def toFloat(values): # Converts an array of strings into floats, anything that isn't a number becomes NaN
+        try:
+            return values.astype(np.float64)
+        except ValueError:
+            result = np.full(values.shape, np.nan)
+            for index, value in enumerate(values):
+                if ColumnParser.isNumeric(value):
+                    result[index] = float(value)
+            return result
+
+    @staticmethod
+    def numericColumns(line, header): # Uses a line of data to decide which columns are numeric
+        sample = line.rstrip('\n').split(',')
+        return [index < len(sample) and ColumnParser.isNumeric(sample[index]) for index, _ in enumerate(header)]
+
+    @staticmethod
+    def blockLayout(block): # Finds where every line of a block of data lines (each ending in a newline) starts and ends, and where its commas are; returns None if the lines don't all have the same number of fields
+        buffer = np.frombuffer(block, dtype=np.uint8)
+        lineEnds = np.flatnonzero(buffer == ord('\n'))
+        commas = np.flatnonzero(buffer == ord(','))
+        if lineEnds.size == 0 or commas.size % lineEnds.size != 0:
+            return None
+        lineStarts = np.concatenate(([0], lineEnds[:-1] + 1))
+        commas = commas.reshape(lineEnds.size, commas.size // lineEnds.size)
+        if commas.shape[1] != 0 and (np.any(commas[:, 0] < lineStarts) or np.any(commas[:, -1] > lineEnds)): # Same count overall but not on every line
+            return None
+        lineEnds = lineEnds - (buffer[np.maximum(lineEnds - 1, 0)] == ord('\r')) # Windows line endings
+        offsets = commas - lineStarts[:, None] # Kept relative to the start of the line so they fit in a small integer type
+        return lineStarts, lineEnds, offsets.astype(np.uint16 if np.amax(lineEnds - lineStarts) < 2**16 else np.uint32)
+
+    @staticmethod
+    def blockField(block, layout, index, rowsPerStep=1 << 20): # Cuts one field out of every line as a fixed width bytes array
+        buffer = np.frombuffer(block, dtype=np.uint8)
+        lineStarts, lineEnds, offsets = layout
+        fieldStarts = lineStarts if index == 0 else lineStarts + offsets[:, index - 1] + 1
+        fieldEnds = lineEnds if index == offsets.shape[1] else lineStarts + offsets[:, index]
+        width = max(int(np.amax(fieldEnds - fieldStarts)), 1)
+        if buffer.size < width: # Too short for a window of the field's width
+            buffer = np.concatenate((buffer, np.zeros(width, dtype=np.uint8)))
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, width) # windows[i] is the width bytes starting at i, without copying
+        fields = np.empty(lineStarts.size, dtype='S' + str(width))
+        for first in range(0, lineStarts.size, rowsPerStep): # In steps so the temporary matrices stay small
+            last = min(first + rowsPerStep, lineStarts.size)
+            starts = np.minimum(fieldStarts[first:last], windows.shape[0] - 1) # Only fields near the end of the block get shifted
+            shift = fieldStarts[first:last] - starts
+            characters = windows[starts]
+            if np.any(shift):
+                characters[shift != 0] = 0 # These few are cut out one by one below
+            characters[np.arange(width) >= (fieldEnds[first:last] - fieldStarts[first:last])[:, None]] = 0 # Padded with null bytes, which numpy drops from bytes strings
+            fields[first:last] = characters.view('S' + str(width)).ravel()
+            for row in np.flatnonzero(shift) + first:
+                fields[row] = block[fieldStarts[row]:fieldEnds[row]]
+        return fields
+
+    @staticmethod
+    def parseColumn(block, index, numeric, layout=None): # Decodes a single column out of a block of data lines
+        if layout == None:
+            layout = ColumnParser.blockLayout(block)
+        if layout == None or index > layout[2].shape[1]: # Ragged lines, let numpy split them up
+            fields = np.loadtxt(block.decode().splitlines(), delimiter=',', usecols=[index], dtype=str, ndmin=1, comments=None)
+        else:
+            fields = ColumnParser.blockField(block, layout, index)
+        if numeric:
+            column = ColumnParser.toFloat(fields)
+            column[column == ColumnParser.missingValue] = np.nan
+            return column
+        return fields.astype(str)
+
+    @staticmethod
+    def dropBlankLines(block):
+        if block[:1].isspace() or b'\n\n' in block or b'\n\r\n' in block:
+            block = b'\n'.join(line for line in block.splitlines() if line.strip() != b'')
+        return block
+
+    @staticmethod
+    def parseBlock(block, header, numeric): # Decodes every column of a block of data lines (bytes), numeric tells which columns hold numbers
+        block = ColumnParser.dropBlankLines(block)
+        if block.strip() == b'':
+            return {head: np.empty(0) if numeric[index] else np.empty(0, dtype=str) for index, head in enumerate(header)}
+        if not block.endswith(b'\n'):
+            block += b'\n'
+        layout = ColumnParser.blockLayout(block)
+        return {head: ColumnParser.parseColumn(block, index, numeric[index], layout) for index, head in enumerate(header)}
+
+    @staticmethod
+    def parseDateTime(dates, times): # Converts the dd:mm:yyyy and hh:mm:ss columns into a single datetime64 column
+        digitsDate = np.asarray(dates, dtype='S10').view(np.uint8).reshape(-1, 10).astype(np.int64) - ord('0')
+        digitsTime = np.asarray(times, dtype='S8').view(np.uint8).reshape(-1, 8).astype(np.int64) - ord('0')
+        day = digitsDate[:, 0]*10 + digitsDate[:, 1]
+        month = digitsDate[:, 3]*10 + digitsDate[:, 4]
+        year = digitsDate[:, 6]*1000 + digitsDate[:, 7]*100 + digitsDate[:, 8]*10 + digitsDate[:, 9]
+        seconds = (digitsTime[:, 0]*10 + digitsTime[:, 1])*3600 + (digitsTime[:, 3]*10 + digitsTime[:, 4])*60 + digitsTime[:, 6]*10 + digitsTime[:, 7]
+        stamps = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1).astype('timedelta64[M]')
+        stamps = stamps.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+        return stamps.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+# end ColumnParser
+
+class TimeIndex: # The rows' datetime64 times in sorted order, so a range of time is found with a binary search instead of checking every row
+    def __init__(self, stamps):
+        stamps = np.asarray(stamps, dtype='datetime64[s]')
+        self.order = None # The order that sorts the rows, None when they already are in order
+        if stamps.size > 1 and np.any(stamps[1:] < stamps[:-1]):
+            self.order = np.argsort(stamps, kind='stable')
+            stamps = stamps[self.order]
+        self.stamps = stamps
+
+    def __len__(self):
+        return self.stamps.size
+
+    def sortRows(self, column): # Puts a column of the rows into time order
+        if self.order is None:
+            return column
+        return column[self.order]
+
+    @staticmethod
+    def windows(month0=None, month1=None, year=None, start=None, end=None, first=None, last=None): # The [start, end) times covered by a query
+        # Without a year the months repeat for every year between first and last, and a starting month after the ending month carries on into the next year
+        if first is None or last is None: # No data
+            return np.empty(0, dtype='datetime64[s]'), np.empty(0, dtype='datetime64[s]')
+        first, last = np.datetime64(first, 's'), np.datetime64(last, 's')
+        if month0 == None and month1 == None and year == None:
+            starts, ends = np.array([first]), np.array([last + np.timedelta64(1, 's')])
+        else:
+            month0 = 1 if month0 == None else int(month0)
+            month1 = 12 if month1 == None else int(month1)
+            if year != None:
+                years = np.array([int(year)])
+            else:
+                years = np.arange(first.astype('datetime64[Y]').astype(np.int64) + 1970 - 1, last.astype('datetime64[Y]').astype(np.int64) + 1970 + 1) # One year early for ranges wrapping into the first year
+            starts = ((years - 1970)*12 + month0 - 1).astype('datetime64[M]').astype('datetime64[s]')
+            ends = ((years + (month1 < month0) - 1970)*12 + month1).astype('datetime64[M]').astype('datetime64[s]') # The start of the month after month1
+        if start != None:
+            starts = np.maximum(starts, np.datetime64(start, 's'))
+        if end != None:
+            ends = np.minimum(ends, np.datetime64(end, 's'))
+        valid = starts < ends
+        return starts[valid], ends[valid]
+
+    @staticmethod
+    def contains(stamps, starts, ends): # Which of the times, in any order, fall inside one of the (sorted, non overlapping) windows
+        if starts.size == 0:
+            return np.zeros(np.shape(stamps), dtype=bool)
+        window = np.searchsorted(starts, stamps, 'right') - 1
+        return (window >= 0) & (stamps < ends[np.maximum(window, 0)])
+
+    def bounds(self, month0=None, month1=None, year=None, start=None, end=None): # The first and one past the last sorted row of every window of a query
+        if self.stamps.size == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        starts, ends = TimeIndex.windows(month0, month1, year, start, end, self.stamps[0], self.stamps[-1])
+        return np.searchsorted(self.stamps, starts, 'left'), np.searchsorted(self.stamps, ends, 'left')
+
+    def slice(self, start=None, end=None): # The sorted rows between two times
+        lower, upper = self.bounds(start=start, end=end)
+        if lower.size == 0:
+            return slice(0, 0)
+        return slice(int(lower[0]), int(upper[0]))
+
+    def mask(self, month0=None, month1=None, year=None, start=None, end=None): # Which of the sorted rows fall within a query
+        lower, upper = self.bounds(month0, month1, year, start, end)
+        marks = np.zeros(self.stamps.size + 1, dtype=np.int64)
+        np.add.at(marks, lower, 1)
+        np.add.at(marks, upper, -1)
+        return np.cumsum(marks[:-1]) > 0
+# end TimeIndex
+
+class QualityFilter: # A quality control test that every row has to pass before it is aggregated, see FilterPipeline; the filters below are its subclasses
+    # A column filter tests the values of the column being plotted, given as the rows of a (column x time) matrix so many columns are tested at once; -999 marks a missing value
+    # fit works out what the test needs from the whole column and apply gives the mask, so a streamed column (fitMoments) or a block of it is tested the same way
+    crossColumn = False # A cross column filter tests other columns instead, and keeps the same rows for every column (see rowMask)
+
+    def __str__(self):
+        return type(self).__name__
+
+    def key(self): # What the filter's results depend on, for the plot cache
+        return (type(self).__name__,) + tuple((name, QualityFilter.frozen(value)) for name, value in sorted(vars(self).items()))
+
+    @staticmethod
+    def frozen(value): # A hashable copy of an argument, lists and arrays become tuples
+        if isinstance(value, dict):
+            return tuple((key, QualityFilter.frozen(item)) for key, item in sorted(value.items()))
+        if isinstance(value, (set, frozenset)):
+            return frozenset(QualityFilter.frozen(item) for item in value)
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return tuple(QualityFilter.frozen(item) for item in value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    @staticmethod
+    def present(values):
+        return (values != ColumnParser.missingValue) & ~np.isnan(values)
+
+    def fit(self, values): # The parameters of the test of every column, and whether each column can be tested at all
+        return (), True
+
+    def fitMoments(self, count, mean, deviation, minimum, maximum): # fit from the moments of a streamed column, which is all that is known of it
+        raise ValueError(str(self) + ' needs the whole column, load the file instead of streaming it')
+
+    def apply(self, values, parameters): # Which values pass
+        return self.present(values)
+# end QualityFilter
+
+class GaussianFilter(QualityFilter): # Keeps the values that fall within width sigma of the peak of the column's Gaussian curve, leaving out zeros and missing values
+    # The whole column, missing values included, sets the curve; a column without any spread can't be tested
+    def __init__(self, width=2):
+        self.width = width
+
+    def __str__(self):
+        return 'Gaussian (' + str(self.width) + ' sigma)'
+
+    @staticmethod
+    def envelope(values, Amplitude, mean, sigma):
+        return Amplitude*np.exp(-(values-mean)**2 / (2*sigma**2)) # Taken from Professor To's Lecture4 ~ 19minutes 20seconds
+
+    def fit(self, values):
+        Amplitude = np.amax(values, axis=-1, keepdims=True)
+        mean = np.mean(values, axis=-1, keepdims=True)
+        sigma = np.sqrt(np.mean((values - mean)**2, axis=-1, keepdims=True)) * np.sqrt(2) # Adding in sqrt(2) to cancel out a log 2
+        usable = ((2*sigma**2) != 0) & (Amplitude != np.amin(values, axis=-1, keepdims=True)) # Can't divide by zero, and a constant column has no spread whatever the rounding says
+        return (Amplitude, mean, np.where(usable, sigma, 1.0)), usable[..., 0]
+
+    def fitMoments(self, count, mean, deviation, minimum, maximum):
+        sigma = deviation * np.sqrt(2)
+        usable = (count != 0) & ((2*sigma**2) != 0) & (maximum != minimum)
+        return (maximum, mean, np.where(usable, sigma, 1.0)), usable
+
+    def apply(self, values, parameters):
+        Amplitude, mean, sigma = parameters
+        ypoints = self.envelope(values, Amplitude, mean, sigma)
+        return (ypoints < Amplitude+(sigma*self.width)) & (ypoints > Amplitude-(sigma*self.width)) & (values != 0) & (values != ColumnParser.missingValue)
+# end GaussianFilter
+
+class SigmaClipFilter(QualityFilter): # Keeps the values within sigma standard deviations of the mean, taking the mean and deviation again of what is kept until nothing more is dropped
+    def __init__(self, sigma=3, iterations=5):
+        self.sigma = sigma
+        self.iterations = iterations
+
+    def __str__(self):
+        return 'Sigma clip (' + str(self.sigma) + ' sigma)'
+
+    def fit(self, values):
+        present = self.present(values)
+        keep = present
+        for _ in range(self.iterations):
+            count = np.maximum(np.count_nonzero(keep, axis=-1, keepdims=True), 1)
+            mean = np.sum(np.where(keep, values, 0.0), axis=-1, keepdims=True)/count
+            deviation = np.sqrt(np.sum(np.where(keep, values - mean, 0.0)**2, axis=-1, keepdims=True)/count)
+            clipped = present & (np.abs(values - mean) <= self.sigma*deviation)
+            if np.array_equal(clipped, keep):
+                break
+            keep = clipped
+        return (mean, deviation), np.any(present, axis=-1)
+
+    def apply(self, values, parameters):
+        mean, deviation = parameters
+        return self.present(values) & (np.abs(values - mean) <= self.sigma*deviation)
+# end SigmaClipFilter
+
+class MADFilter(QualityFilter): # Keeps the values whose modified z-score, from the median and the median absolute deviation, is at most threshold
+    def __init__(self, threshold=3.5):
+        self.threshold = threshold
+
+    def __str__(self):
+        return 'MAD (' + str(self.threshold) + ')'
+
+    def fit(self, values):
+        present = self.present(values)
+        usable = np.any(present, axis=-1)
+        values = np.where(present, values, np.nan)
+        values[~usable] = 0.0 # Keeps nanmedian quiet about columns without any values
+        median = np.nanmedian(values, axis=-1, keepdims=True)
+        return (median, np.nanmedian(np.abs(values - median), axis=-1, keepdims=True)), usable
+
+    def apply(self, values, parameters):
+        median, deviation = parameters
+        return self.present(values) & (0.6745*np.abs(values - median) <= self.threshold*deviation)
+# end MADFilter
+
+class IQRFilter(QualityFilter): # Keeps the values no further than factor interquartile ranges outside of the quartiles
+    def __init__(self, factor=1.5):
+        self.factor = factor
+
+    def __str__(self):
+        return 'IQR (' + str(self.factor) + ')'
+
+    def fit(self, values):
+        present = self.present(values)
+        usable = np.any(present, axis=-1)
+        values = np.where(present, values, np.nan)
+        values[~usable] = 0.0
+        lower, upper = np.nanpercentile(values, [25, 75], axis=-1, keepdims=True)
+        return (lower, upper), usable
+
+    def apply(self, values, parameters):
+        lower, upper = parameters
+        spread = self.factor*(upper - lower)
+        return self.present(values) & (values >= lower - spread) & (values <= upper + spread)
+# end IQRFilter
+
+class RangeFilter(QualityFilter): # Keeps the values from low to high, inclusive; with a head it tests that column instead, for every column
+    def __init__(self, low=None, high=None, head=None):
+        self.low = low
+        self.high = high
+        self.head = head
+        self.crossColumn = head != None
+
+    def __str__(self):
+        return 'Range ' + ('' if self.head == None else self.head + ' ') + '[' + str(self.low) + ', ' + str(self.high) + ']'
+
+    def fitMoments(self, count, mean, deviation, minimum, maximum):
+        return self.fit(None)
+
+    def apply(self, values, parameters=()):
+        keep = self.present(values)
+        if self.low != None:
+            keep &= values >= self.low
+        if self.high != None:
+            keep &= values <= self.high
+        return keep
+
+    def rowMask(self, lookup): # lookup(head) gives a column in the order of the rows
+        return self.apply(lookup(self.head))
+# end RangeFilter
+
+class PredicateFilter(QualityFilter): # Keeps the rows where another column compares to a value as operator says, e.g. PredicateFilter('Precipitable_Water(cm)', '<', 6)
+    # The comparison is made on the values as the file has them, so PredicateFilter('AOD_500nm-Total', '!=', -999) keeps the rows that have a measurement
+    crossColumn = True
+    operators = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal}
+
+    def __init__(self, head, operator, value):
+        if operator not in self.operators:
+            raise ValueError('Unknown operator ' + str(operator) + ', use one of ' + ', '.join(self.operators))
+        self.head = head
+        self.operator = operator
+        self.value = value
+
+    def __str__(self):
+        return self.head + ' ' + self.operator + ' ' + str(self.value)
+
+    def rowMask(self, lookup):
+        return self.operators[self.operator](np.nan_to_num(lookup(self.head), nan=ColumnParser.missingValue), self.value)
+# end PredicateFilter
+
+class FilterPipeline: # Quality filters that are each evaluated as a mask over whole columns and combined, a row has to pass every one of them
+    # report keeps, for every column, how many of the requested rows each filter kept and dropped on its own and how many were kept in the end
+    def __init__(self, filters=None):
+        self.filters = [GaussianFilter()] if filters == None else list(filters)
+        self.report = {}
+
+    def __str__(self):
+        return ', '.join(str(qualityFilter) for qualityFilter in self.filters)
+
+    def key(self):
+        return tuple(qualityFilter.key() for qualityFilter in self.filters)
+
+    def columnFilters(self):
+        return [qualityFilter for qualityFilter in self.filters if not qualityFilter.crossColumn]
+
+    def rowMasks(self, lookup): # The mask of every cross column filter, lookup(head) gives a column in the order of the rows
+        return [(str(qualityFilter), qualityFilter.rowMask(lookup)) for qualityFilter in self.filters if qualityFilter.crossColumn]
+
+    def fit(self, values):
+        return [qualityFilter.fit(values) for qualityFilter in self.columnFilters()]
+
+    def fitMoments(self, count, mean, deviation, minimum, maximum):
+        return [qualityFilter.fitMoments(count, mean, deviation, minimum, maximum) for qualityFilter in self.columnFilters()]
+
+    def evaluate(self, heads, values, inRange, rowMasks=(), parameters=None): # Which values of the (column x time) matrix are kept, and which columns could be tested at all
+        # inRange are the requested rows, rowMasks come from rowMasks and parameters from fit (of the whole columns) unless values are the whole columns
+        if values.shape[-1] == 0:
+            return np.zeros(values.shape, dtype=bool), np.zeros(values.shape[0], dtype=bool)
+        if parameters == None:
+            parameters = self.fit(values)
+        keep = np.broadcast_to(inRange, values.shape) & QualityFilter.present(values) # A missing value is never kept, whichever filters there are
+        usable = np.ones(values.shape[0], dtype=bool)
+        stages = []
+        for name, mask in rowMasks:
+            stages.append((name, np.broadcast_to(mask & inRange, values.shape)))
+        for qualityFilter, (filterParameters, filterUsable) in zip(self.columnFilters(), parameters):
+            usable &= np.broadcast_to(filterUsable, usable.shape)
+            stages.append((str(qualityFilter), qualityFilter.apply(values, filterParameters) & inRange))
+        for _, mask in stages:
+            keep &= mask
+        keep &= usable[:, None]
+        requested = int(np.count_nonzero(inRange))
+        for index, head in enumerate(heads):
+            counts = self.report.setdefault(head, collections.OrderedDict())
+            for name, mask in stages + [('Combined', keep)]:
+                kept = int(np.count_nonzero(mask[index]))
+                total = counts.setdefault(name, [0, 0])
+                total[0] += kept
+                total[1] += requested - kept
+        return keep, usable
+
+    def resetReport(self, heads=None):
+        for head in (self.report.copy() if heads == None else heads):
+            self.report.pop(head, None)
+
+    def formatReport(self, head): # The report of one column as lines of text
+        return '\n'.join(name + ': kept ' + str(kept) + ', dropped ' + str(dropped) for name, (kept, dropped) in self.report.get(head, {}).items())
+# end FilterPipeline
+
+class LocalTime: # Converts arrays of UTC times to local time all at once, from an IANA timezone (following its daylight saving time) or from the sites' longitudes
+    @staticmethod
+    def transitions(zone, first, last): # The times between first and last when the UTC offset of zone changes, and the offsets before, between and after them
+        # The offset is sampled once a day and every change is narrowed down to the second, so only a few calls per day of data are made to zoneinfo
+        timezone = zoneinfo.ZoneInfo(zone)
+        offsetAt = lambda second: int(datetime.datetime.fromtimestamp(second, timezone).utcoffset().total_seconds())
+        days = np.arange(np.datetime64(first, 'D'), np.datetime64(last, 'D') + 2).astype('datetime64[s]').astype(np.int64).tolist()
+        samples = [offsetAt(day) for day in days]
+        changes, offsets = [], [samples[0]]
+        for index in np.flatnonzero(np.diff(samples)):
+            low, high = days[index], days[index + 1]
+            while high - low > 1:
+                middle = (low + high)//2
+                if offsetAt(middle) == samples[index]:
+                    low = middle
+                else:
+                    high = middle
+            changes.append(high)
+            offsets.append(samples[index + 1])
+        return np.array(changes, dtype=np.int64).astype('datetime64[s]'), np.array(offsets, dtype=np.int64).astype('timedelta64[s]')
+
+    @staticmethod
+    def zoneOffsets(times, zone): # The UTC offset of zone at every time
+        times = np.asarray(times, dtype='datetime64[s]')
+        if times.size == 0:
+            return np.zeros(0, dtype='timedelta64[s]')
+        changes, offsets = LocalTime.transitions(zone, times.min(), times.max())
+        return offsets[np.searchsorted(changes, times, side='right')]
+
+    @staticmethod
+    def longitudeOffsets(longitudes): # The nominal timezone of every longitude, whole hours of 15 degrees east of Greenwich; an unknown longitude stays in UTC
+        hours = np.round(np.nan_to_num(np.asarray(longitudes, dtype=np.float64))/15)
+        return (hours*3600).astype(np.int64).astype('timedelta64[s]')
+
+    @staticmethod
+    def convert(times, zone=None, longitudes=None): # zone is an IANA timezone name, 'longitude' to use the longitudes, or None to leave the times in UTC
+        times = np.asarray(times, dtype='datetime64[s]')
+        if zone == None:
+            return times
+        if zone == 'longitude':
+            return times + LocalTime.longitudeOffsets(longitudes)
+        return times + LocalTime.zoneOffsets(times, zone)
+# end LocalTime
+
+class HalfDayBins: # Groups times into the half-days the plots use, day from 6am to 6pm and night from 6pm to 6am (UTC, or local time, see LocalTime)
+    # A half-day's id is floor((t - 6h)/12h) counted from 1970, so days have even ids and nights odd ones, and gaps or unsorted rows need no special care
+    start = np.timedelta64(6, 'h')
+    length = np.timedelta64(12, 'h')
+
+    @staticmethod
+    def bucketIds(times):
+        return ((np.asarray(times, dtype='datetime64[s]') - np.datetime64(0, 's') - HalfDayBins.start) // HalfDayBins.length).astype(np.int64)
+
+    @staticmethod
+    def group(bucketIds, values): # The ids of the half-days present and each one's count, mean and sum of squared differences from the mean
+        keys, inverse = np.unique(bucketIds, return_inverse=True)
+        values = np.asarray(values, dtype=np.float64)
+        count = np.bincount(inverse, minlength=keys.size)
+        mean = np.bincount(inverse, values, keys.size)/np.maximum(count, 1)
+        squares = np.bincount(inverse, (values - mean[inverse])**2, keys.size)
+        return keys, count, mean, squares
+
+    @staticmethod
+    def times(labels): # The middle of the half-day of every label, noon for a day and midnight for a night; a label without _day or _night is taken as a day
+        characters = np.array(labels, dtype='U10').view('U1').reshape(-1, 10)[:, [6, 7, 8, 9, 2, 3, 4, 5, 0, 1]] # dd:mm:yyyy to yyyy-mm-dd
+        characters[:, [4, 7]] = '-'
+        dates = np.ascontiguousarray(characters).view('U10').ravel().astype('datetime64[D]').astype('datetime64[s]')
+        return dates + np.where(np.char.endswith(np.asarray(labels, dtype=str), '_night'), 0, 12*3600).astype('timedelta64[s]')
+
+    @staticmethod
+    def labels(keys): # 'dd:mm:yyyy_day' or 'dd:mm:yyyy_night', a night is labelled with the date it ends on
+        middle = np.datetime64(0, 's') + HalfDayBins.start + keys*HalfDayBins.length + HalfDayBins.length//2
+        characters = np.datetime_as_string(middle.astype('datetime64[D]')).astype('U10').view('U1').reshape(-1, 10)[:, [8, 9, 7, 5, 6, 4, 0, 1, 2, 3]] # yyyy-mm-dd to dd-mm-yyyy
+        characters[:, [2, 5]] = ':'
+        dates = np.ascontiguousarray(characters).view('U10').ravel()
+        return np.char.add(dates, np.where(keys % 2 == 0, '_day', '_night'))
+# end HalfDayBins
+
+class LeastSquaresFit: # Fits that are linear in their coefficients (polynomials or any other basis), solved in closed form for many plots at once
+    @staticmethod
+    def polynomialBasis(x, degree=3): # x^0 ... x^degree as the last axis
+        return np.asarray(x, dtype=np.float64)[..., None]**np.arange(degree + 1)
+
+    @staticmethod
+    def fit(yDataArray, degree=3, xDataArray=None, basis=None): # The (coefficients, residuals, rSquared) of the least squares fit of every plot, against its index unless xDataArray is given
+        # Every plot is padded to the longest one and the padding is masked out of the normal equations
+        # A polynomial has x scaled to [0, 1] to keep them well conditioned and its coefficients come back lowest power first, as np.polynomial takes them
+        # basis(x) gives the columns of any other linear model, its coefficients are in the order of its columns
+        if len(yDataArray) == 0:
+            return []
+        lengths = np.array([len(yData) for yData in yDataArray])
+        length = max(lengths)
+        present = np.arange(length) < lengths[:, None]
+        yMatrix = np.zeros((len(yDataArray), length))
+        yMatrix[present] = np.concatenate([np.asarray(yData, dtype=np.float64) for yData in yDataArray])
+        x = np.zeros((len(yDataArray), length))
+        if xDataArray is None:
+            x[:] = np.arange(length)
+        else:
+            x[present] = np.concatenate([np.asarray(xData, dtype=np.float64) for xData in xDataArray])
+        if basis == None:
+            offset = np.array([np.amin(row[mask]) if mask.any() else 0.0 for row, mask in zip(x, present)])
+            scale = np.array([np.amax(row[mask]) if mask.any() else 0.0 for row, mask in zip(x, present)]) - offset
+            scale[scale == 0] = 1.0
+            columns = LeastSquaresFit.polynomialBasis((x - offset[:, None])/scale[:, None], degree)
+        else:
+            columns = np.asarray(basis(x), dtype=np.float64)
+        columns = columns*present[:, :, None] # Zero where padded
+        normal = np.einsum('pni,pnj->pij', columns, columns)
+        right = np.einsum('pni,pn->pi', columns, yMatrix)
+        coefficients = np.einsum('pij,pj->pi', np.linalg.pinv(normal, hermitian=True), right)
+        yFit = np.einsum('pni,pi->pn', columns, coefficients)
+        if basis == None: # Back to the unshifted, unscaled x
+            coefficients = np.array([LeastSquaresFit._unscale(c, o, s) for c, o, s in zip(coefficients, offset, scale)])
+        residuals = np.where(present, yMatrix - yFit, 0.0)
+        mean = np.sum(yMatrix, axis=1)/np.maximum(lengths, 1)
+        ssRes = np.sum(residuals**2, axis=1)
+        ssTot = np.sum(np.where(present, yMatrix - mean[:, None], 0.0)**2, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rSquared = np.where(ssTot != 0, 1 - ssRes/ssTot, np.nan) # Undefined for a flat plot
+        return [(coefficients[index], residuals[index, :lengths[index]], rSquared[index]) for index in range(len(yDataArray))]
+
+    @staticmethod
+    def _unscale(coefficients, offset, scale): # The coefficients of p((x - offset)/scale) as a polynomial of x, as many as were given
+        unscaled = np.polynomial.polynomial.Polynomial(coefficients, domain=[offset, offset + scale], window=[0, 1]).convert().coef
+        return np.pad(unscaled, (0, len(coefficients) - len(unscaled))) # convert drops the highest powers when they come out zero
+
+    @staticmethod
+    def evaluate(coefficients, x): # The fitted polynomial at x
+        return np.polynomial.polynomial.polyval(np.asarray(x, dtype=np.float64), coefficients)
+# end LeastSquaresFit
+
+class Decimation: # Thins out the points of a plot to about what the pixels of its axes can show before they are drawn, so drawing takes as long however long the record is
+    # Every kept point stands for a group of points, and its error bar is stretched over the bars of the whole group so no spread is hidden
+    methods = ('minmax', 'lttb')
+
+    @staticmethod
+    def columns(x, width): # Which of width equal spans of x (numeric and sorted) every point falls in, one span for every pixel
+        x = np.asarray(x, dtype=np.float64) - x[0]
+        return np.minimum((x*width//max(x[-1], 1)).astype(np.intp), width - 1)
+
+    @staticmethod
+    def minMax(y, groups): # The lowest and the highest point of every group (nondecreasing), in order
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        group = np.cumsum(np.r_[False, groups[1:] != groups[:-1]])
+        lowest = np.flatnonzero(y == np.minimum.reduceat(y, starts)[group])
+        highest = np.flatnonzero(y == np.maximum.reduceat(y, starts)[group])
+        return np.unique(np.concatenate((lowest[np.r_[True, np.diff(group[lowest]) != 0]], highest[np.r_[True, np.diff(group[highest]) != 0]]))) # The first of any ties
+
+    @staticmethod
+    def lttb(x, y, points): # Largest-Triangle-Three-Buckets: the first and last points, and from every one of points-2 equal buckets in between the point making the largest triangle with the point kept before it and the mean of the next bucket; also the bucket of every point
+        x = np.asarray(x, dtype=np.float64) - x[0]
+        edges = np.linspace(1, x.size - 1, points - 1).astype(np.intp) # Where the buckets start, the last edge is the last point
+        count = np.diff(edges)
+        meanX = np.add.reduceat(x[:-1], edges[:-1])/count
+        meanY = np.add.reduceat(y[:-1], edges[:-1])/count
+        nextX, nextY = np.r_[meanX[1:], x[-1]], np.r_[meanY[1:], y[-1]]
+        kept = np.empty(points, dtype=np.intp)
+        kept[0], kept[-1] = 0, x.size - 1
+        a = 0
+        for bucket in range(points - 2): # Each choice depends on the one before it
+            first, last = edges[bucket], edges[bucket + 1]
+            area = np.abs((x[a] - nextX[bucket])*(y[first:last] - y[a]) - (x[a] - x[first:last])*(nextY[bucket] - y[a]))
+            a = first + int(np.argmax(area))
+            kept[bucket + 1] = a
+        return kept, np.searchsorted(edges, np.arange(x.size), side='right')
+
+    @staticmethod
+    def errorBars(y, yErr, groups, kept): # The (lower, upper) error bars of the kept points, each covering the bars of every point of its group; groups is nondecreasing
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        low = np.minimum.reduceat(y - yErr[0], starts)
+        high = np.maximum.reduceat(y + yErr[1], starts)
+        group = np.searchsorted(starts, kept, side='right') - 1
+        return np.array([y[kept] - low[group], high[group] - y[kept]])
+
+    @staticmethod
+    def decimate(x, y, yErr, width, method='minmax'): # The indices of the points kept of a plot about width pixels wide and their error bars; nothing is dropped when there are no more than two points per pixel or method is None
+        y = np.asarray(y, dtype=np.float64)
+        yErr = np.broadcast_to(np.asarray(yErr, dtype=np.float64), (2, y.size))
+        if method == None or y.size <= 2*width:
+            return np.arange(y.size), yErr
+        if method == 'minmax':
+            groups = Decimation.columns(x, width)
+            kept = Decimation.minMax(y, groups)
+        elif method == 'lttb':
+            kept, groups = Decimation.lttb(x, y, 2*width)
+        else:
+            raise ValueError('Unknown decimation method: ' + str(method))
+        return kept, Decimation.errorBars(y, yErr, groups, kept)
+# end Decimation
+
+class PlotTemplate: # A figure of rows x columns axes that are styled once, each plot drawn on it only swaps its data, title and labels
+    units = (('nm', 'Wavelength(nm)', False), ('µm', 'Wavelength(µm)', False), ('cm', 'Wavelength(cm)', False), ('hPa', 'Pressure(hPa)', False),
+             ('degrees_c', 'Celsius(°C)', True), ('angle', 'Angle(°)', True), ('longitude', 'Longitude(λ)', True), ('latitude', 'Latitude(Φ)', True), ('wavelength', 'Wavelength', True)) # The first (substring, y axis name, whether any case matches) found in a header names its axis
+    labels = {} # header -> y axis name, worked out the first time a header is drawn
+
+    def __init__(self, rows=1, columns=1):
+        self.figure, axes = plt.subplots(rows, columns, squeeze=False, figsize=(12.8, 7.2), layout='constrained' if rows*columns > 1 else None)
+        self.axes = axes.ravel()
+        self.artists = [None]*self.axes.size # The error bars drawn on every axes
+
+    @staticmethod
+    def unitOf(head): # The y axis name of a header, from its unit
+        label = PlotTemplate.labels.get(head)
+        if label == None:
+            label = next((name for key, name, anyCase in PlotTemplate.units if key in (head.lower() if anyCase else head)), '')
+            PlotTemplate.labels[head] = label
+        return label
+
+    @staticmethod
+    def dateAxis(axis, times, compact=False): # Places the x ticks of a time axis and returns its name; the 1st and 15th of every month over a year or less, otherwise (or when compact) whatever suits the span
+        if not compact and times.size != 0 and times.max() - times.min() <= np.timedelta64(370, 'D'):
+            axis.xaxis.set_major_locator(mdates.MonthLocator(bymonthday=(1, 15)))
+            axis.xaxis.set_major_formatter(mdates.DateFormatter('%b. %d'))
+        else:
+            locator = mdates.AutoDateLocator(maxticks=6 if compact else None)
+            axis.xaxis.set_major_locator(locator)
+            axis.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        years = np.unique(times.astype('datetime64[Y]')).astype(str)
+        if years.size == 1: # If only one year was detected
+            return 'Months in ' + years[0]
+        if years.size <= 3:
+            return 'Months in (' + ', '.join(years) + ')'
+        return 'Dates from ' + years[0] + ' to ' + years[-1]
+
+    def isOpen(self): # Whether the figure is still there to draw on, a shown window is gone once it is closed
+        return plt.fignum_exists(self.figure.number)
+
+    def draw(self, index, head, times, y, yErr, compact=False): # Puts a plot on the index-th axes in place of the one that was there
+        axis = self.axes[index]
+        if self.artists[index] != None:
+            self.artists[index].remove()
+        axis.set_visible(True)
+        self.artists[index] = axis.errorbar(times, y, yerr=yErr, fmt='o', color='black', capsize=1 if compact else 2, markersize=2 if compact else 3)
+        axis.relim()
+        axis.autoscale_view()
+        text = {'fontsize': 'small'} if compact else {}
+        axis.set_title(head, **text)
+        axis.set_xlabel(PlotTemplate.dateAxis(axis, times, compact), **text)
+        axis.set_ylabel(PlotTemplate.unitOf(head), **text)
+
+    def hide(self, used): # Hides the axes after the first used ones, which a shorter set of plots leaves empty
+        for axis in self.axes[used:]:
+            axis.set_visible(False)
+# end PlotTemplate
+
+class Climatology: # Monthly statistics of many columns in one grouped pass: per calendar month (every January together) or per month of every year
+    # Missing (NaN) values are left out of every statistic; the percentiles interpolate linearly, as np.percentile does
+    @staticmethod
+    def calendarMonths(times): # 1 to 12
+        return (np.asarray(times, dtype='datetime64[s]').astype('datetime64[M]').astype(np.int64) % 12) + 1
+
+    @staticmethod
+    def yearMonths(times): # Month number since 1970, see np.datetime64(..., 'M')
+        return np.asarray(times, dtype='datetime64[s]').astype('datetime64[M]').astype(np.int64)
+
+    @staticmethod
+    def grouped(groups, matrix, percentiles=(5, 25, 75, 95)): # The groups present and, for every row of the (column x time) matrix, each group's count, mean, standard deviation, median and percentiles
+        # count, mean, std and median are (column x group), the percentiles are (column x group x len(percentiles))
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+        order = np.argsort(groups, kind='stable') # Every group becomes a run of columns of the matrix
+        keys, starts = np.unique(np.asarray(groups)[order], return_index=True)
+        ends = np.append(starts[1:], order.size)
+        quantiles = np.concatenate(([50], np.asarray(percentiles, dtype=np.float64)))/100
+        count = np.zeros((matrix.shape[0], keys.size), dtype=np.int64)
+        mean = np.full((matrix.shape[0], keys.size), np.nan)
+        deviation = np.full((matrix.shape[0], keys.size), np.nan)
+        ranked = np.full((matrix.shape[0], keys.size, quantiles.size), np.nan)
+        for index, (first, last) in enumerate(zip(starts, ends)):
+            values = np.sort(matrix[:, order[first:last]], axis=1) # NaNs are sorted to the end
+            present = np.count_nonzero(~np.isnan(values), axis=1)
+            count[:, index] = present
+            usable = present > 0
+            if not np.any(usable):
+                continue
+            total = np.nansum(values, axis=1)
+            mean[usable, index] = total[usable]/present[usable]
+            deviation[usable, index] = np.sqrt(np.nansum((values - mean[:, index, None])**2, axis=1)[usable]/present[usable])
+            position = (np.maximum(present, 1) - 1)[:, None]*quantiles # Where every quantile falls among the present values
+            below = np.floor(position).astype(np.int64)
+            above = np.minimum(below + 1, np.maximum(present, 1)[:, None] - 1)
+            low, high = np.take_along_axis(values, below, axis=1), np.take_along_axis(values, above, axis=1)
+            ranked[usable, index] = (low + (high - low)*(position - below))[usable]
+        return keys, count, mean, deviation, ranked[:, :, 0], ranked[:, :, 1:]
+
+    @staticmethod
+    def compute(times, columns, percentiles=(5, 25, 75, 95), byYear=False): # header -> (months, count, mean, std, median, percentiles) of the columns (header -> values) at times
+        # months are 1 to 12, or datetime64[M] byYear
+        heads = list(columns)
+        if len(heads) == 0:
+            return {}
+        groups = Climatology.yearMonths(times) if byYear else Climatology.calendarMonths(times)
+        keys, *stats = Climatology.grouped(groups, np.stack([np.asarray(columns[head], dtype=np.float64) for head in heads]), percentiles)
+        if byYear:
+            keys = keys.astype('datetime64[M]')
+        return {head: (keys, *(stat[index] for stat in stats)) for index, head in enumerate(heads)}
+# end Climatology
+
+class OnlineStats: # The exact count, mean, variance, minimum and maximum of values grouped by integer keys, folded in one block of rows at a time
+    # Blocks and other accumulators (of other workers or files) are combined with Chan et al.'s parallel form of Welford's update, so no column is ever held whole
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64) # In sorted order
+        self.count = np.empty(0, dtype=np.int64)
+        self.mean = np.empty(0)
+        self.squares = np.empty(0) # Sum of squared differences from the mean
+        self.minimum = np.empty(0)
+        self.maximum = np.empty(0)
+
+    def __len__(self):
+        return self.keys.size
+
+    @staticmethod
+    def groupOf(keys, values): # The keys present in a block and each one's count, mean, sum of squared differences, minimum and maximum
+        keys, inverse = np.unique(keys, return_inverse=True)
+        count = np.bincount(inverse, minlength=keys.size)
+        mean = np.bincount(inverse, values, keys.size)/np.maximum(count, 1)
+        squares = np.bincount(inverse, (values - mean[inverse])**2, keys.size)
+        minimum = np.full(keys.size, np.inf)
+        maximum = np.full(keys.size, -np.inf)
+        np.minimum.at(minimum, inverse, values)
+        np.maximum.at(maximum, inverse, values)
+        return keys, count, mean, squares, minimum, maximum
+
+    def add(self, values, keys=None): # Folds in a block of values, all under key 0 unless keys gives each one's group; missing (NaN) values are left out
+        values = np.asarray(values, dtype=np.float64).ravel()
+        keys = np.zeros(values.size, dtype=np.int64) if keys is None else np.asarray(keys, dtype=np.int64).ravel()
+        valid = ~np.isnan(values)
+        if np.any(valid):
+            self.addGroups(*self.groupOf(keys[valid], values[valid]))
+        return self
+
+    def addGroups(self, keys, count, mean, squares, minimum, maximum): # Merges in groups that were already summarised, e.g. by groupOf in another worker
+        parts = [np.concatenate(pair) for pair in zip((self.keys, self.count, self.mean, self.squares, self.minimum, self.maximum), (keys, count, mean, squares, minimum, maximum))]
+        keys, count, mean, squares, minimum, maximum = parts
+        merged, inverse = np.unique(keys, return_inverse=True)
+        total = np.bincount(inverse, count, merged.size)
+        totalMean = np.bincount(inverse, count*mean, merged.size)/np.maximum(total, 1)
+        self.squares = np.bincount(inverse, squares + count*(mean - totalMean[inverse])**2, merged.size) # The spread within the parts plus the spread between them
+        self.minimum, self.maximum = np.full(merged.size, np.inf), np.full(merged.size, -np.inf)
+        np.minimum.at(self.minimum, inverse, minimum)
+        np.maximum.at(self.maximum, inverse, maximum)
+        self.keys, self.count, self.mean = merged, total.astype(np.int64), totalMean
+        return self
+
+    def merge(self, other): # Folds in another accumulator, of another block, worker or file
+        return self.addGroups(other.keys, other.count, other.mean, other.squares, other.minimum, other.maximum)
+
+    def groups(self): # keys, count, mean, sum of squared differences, minimum and maximum
+        return self.keys, self.count, self.mean, self.squares, self.minimum, self.maximum
+
+    def variance(self, ddof=0):
+        return np.divide(self.squares, self.count - ddof, out=np.zeros(self.keys.size), where=self.count > ddof)
+
+    def table(self): # keys, count, mean, standard deviation, minimum and maximum
+        return self.keys, self.count, self.mean, np.sqrt(self.variance()), self.minimum, self.maximum
+
+    def get(self, key=0): # count, mean, standard deviation, minimum and maximum of one key, zero and NaNs if it has no values
+        index = np.searchsorted(self.keys, key)
+        if index == self.keys.size or self.keys[index] != key:
+            return 0, np.nan, np.nan, np.nan, np.nan
+        return int(self.count[index]), self.mean[index], np.sqrt(self.variance()[index]), self.minimum[index], self.maximum[index]
+# end OnlineStats
+
+class RunningAggregates: # Aggregates of columns that are updated with only the new rows: the count, mean, variance, minimum and maximum overall, per half-day, day and month, and a polynomial fit against time
+    # Missing values are left out; the half-days are the plots', see HalfDayBins. Aggregates of other files or workers are combined with merge
+    # The fit keeps the triangle R and Q^T y of the QR decomposition of its rows in years since origin instead of their normal equations, whose raw power sums are singular in practice over long records
+    year = 365.25 # Days
+    def __init__(self, heads, degree=3):
+        self.heads = list(heads)
+        self.degree = degree
+        self.reset()
+
+    def reset(self):
+        self.origin = None # The time the fit's x is measured from
+        self.totals = {head: OnlineStats() for head in self.heads}
+        self.halfDays = {head: OnlineStats() for head in self.heads} # By half-day number, see HalfDayBins.bucketIds
+        self.days = {head: OnlineStats() for head in self.heads} # By day number since 1970
+        self.months = {head: OnlineStats() for head in self.heads} # By month number since 1970
+        self.triangular = {head: (np.zeros((0, self.degree + 1)), np.zeros(0)) for head in self.heads} # R and Q^T y of every fit so far
+
+    def update(self, times, columns): # Adds a batch of rows, times is their datetime64 and columns is header -> values
+        times = np.asarray(times, dtype='datetime64[s]')
+        if times.size == 0:
+            return
+        if self.origin is None:
+            self.origin = times.min()
+        halfDays = HalfDayBins.bucketIds(times)
+        days = times.astype('datetime64[D]').astype(np.int64)
+        months = times.astype('datetime64[M]').astype(np.int64)
+        x = (times - self.origin)/np.timedelta64(1, 'D')/RunningAggregates.year
+        for head in self.heads:
+            if head not in columns:
+                continue
+            values = np.asarray(columns[head], dtype=np.float64)
+            valid = ~np.isnan(values)
+            if not np.any(valid):
+                continue
+            values = values[valid]
+            self.totals[head].add(values)
+            for keys, store in ((halfDays, self.halfDays), (days, self.days), (months, self.months)):
+                store[head].add(values, keys[valid])
+            self._addRows(head, x[valid][:, None]**np.arange(self.degree + 1), values)
+
+    def _addRows(self, head, rows, values): # Folds rows of the fit (in the basis of x^0 ... x^degree) and their values into its triangle
+        triangle, projected = self.triangular[head]
+        q, r = np.linalg.qr(np.concatenate((triangle, rows)))
+        self.triangular[head] = r, q.T @ np.concatenate((projected, values))
+
+    def merge(self, other): # Folds in the aggregates of another file or worker, for the heads both have
+        if other.degree != self.degree:
+            raise ValueError('Can not merge aggregates of fits of degree ' + str(other.degree) + ' and ' + str(self.degree))
+        if other.origin is None:
+            return self
+        if self.origin is None:
+            self.origin = other.origin
+        shift = (other.origin - self.origin)/np.timedelta64(1, 'D')/RunningAggregates.year
+        powers = np.arange(self.degree + 1)
+        binomial = np.array([[math.comb(i, j) for j in powers] for i in powers])
+        toOrigin = binomial*np.where(powers[:, None] >= powers, shift**np.maximum(powers[:, None] - powers, 0), 0.0) # (x + shift)^i in powers of x
+        for head in self.heads:
+            if head not in other.heads:
+                continue
+            for store, otherStore in ((self.totals, other.totals), (self.halfDays, other.halfDays), (self.days, other.days), (self.months, other.months)):
+                store[head].merge(otherStore[head])
+            otherTriangle, otherProjected = other.triangular[head]
+            self._addRows(head, otherTriangle @ toOrigin.T, otherProjected) # The other's rows, in powers of x since this origin
+        return self
+
+    def summary(self, head): # count, mean, standard deviation, minimum and maximum of all of the rows
+        count, mean, deviation, minimum, maximum = self.totals[head].get()
+        return count, mean if count > 0 else 0.0, deviation if count > 0 else 0.0, minimum if count > 0 else np.inf, maximum if count > 0 else -np.inf
+
+    def halfDayStats(self, head): # The start of every half-day and its count, mean, standard deviation, minimum and maximum
+        keys, *stats = self.halfDays[head].table()
+        return (keys*HalfDayBins.length + HalfDayBins.start + np.datetime64(0, 's'), *stats)
+
+    def dayStats(self, head): # Every day (datetime64[D]) and its count, mean, standard deviation, minimum and maximum
+        keys, *stats = self.days[head].table()
+        return (keys.astype('datetime64[D]'), *stats)
+
+    def monthStats(self, head): # Every month (datetime64[M]) and its count, mean, standard deviation, minimum and maximum
+        keys, *stats = self.months[head].table()
+        return (keys.astype('datetime64[M]'), *stats)
+
+    def fit(self, head): # The polynomial coefficients, highest power first as np.polyval takes them, of the fit against days since origin
+        triangle, projected = self.triangular[head]
+        if projected.size == 0:
+            return np.zeros(self.degree + 1)
+        coefficients = np.linalg.lstsq(triangle, projected, rcond=None)[0] # In years, lowest power first
+        return (coefficients/RunningAggregates.year**np.arange(self.degree + 1))[::-1]
+# end RunningAggregates
+
+class ParsedFileCache: # Sidecar cache of parsed files; every column and the rows' times are kept as memory-mappable .npy files and checked against the source's size, modification time and content hash
+    # Columns and times are written as they are decoded, the ones that never were are decoded from the file when first requested
+    formatVersion = 2
+
+    def __init__(self, directory=None):
+        self.directory = directory # Where the caches are kept, by default each is a filename.npcache directory next to the data file
+
+    def cachePath(self, filename):
+        if self.directory == None:
+            return filename + '.npcache'
+        pathHash = hashlib.blake2b(os.path.abspath(filename).encode(), digest_size=8).hexdigest() # Keeps files with the same name in different folders apart
+        return os.path.join(self.directory, os.path.basename(filename) + '.' + pathHash + '.npcache')
+
+    @staticmethod
+    def contentHash(filename):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(filename, 'rb') as dataFile:
+            for chunk in iter(lambda: dataFile.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self, filename, container): # Fills the container from the cache, returns False if there is no usable cache for the file
+        path = self.cachePath(filename)
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r') as metaFile:
+                meta = json.load(metaFile)
+            status = os.stat(filename)
+        except (OSError, ValueError):
+            return False
+        if meta.get('formatVersion') != self.formatVersion or meta['size'] != status.st_size:
+            return False
+        if meta['mtime'] != status.st_mtime_ns: # The file was touched, only the content hash can tell if it really changed
+            if meta['hash'] != self.contentHash(filename):
+                return False
+            meta['mtime'] = status.st_mtime_ns
+            self._writeMeta(path, meta)
+        columns = {}
+        for index, head in enumerate(meta['headers']):
+            try:
+                columns[head] = np.load(os.path.join(path, 'column' + str(index) + '.npy'), mmap_mode='r')
+            except (OSError, ValueError): # Not decoded yet, or unmappable (e.g. empty); it is decoded from the file when requested
+                pass
+        try:
+            rowTimes = np.load(os.path.join(path, 'time.npy'), mmap_mode='r')
+        except (OSError, ValueError): # Not parsed yet, they are parsed from the date and time columns when requested
+            rowTimes = None
+        container.setVersion(meta['version'])
+        container.setLocation(meta['location'])
+        container.setAODLevel(meta['AODLevel'])
+        container.setDescription(meta['description'])
+        container.setContactInfo(meta['contactInfo'])
+        container.setReference(meta['reference'])
+        container.setHeader(meta['header'])
+        container.setColumns(columns, rowTimes, meta['dataLength'])
+        container.numericColumns = meta['numeric']
+        container.dataStart = meta['dataStart']
+        container.dataOffset = status.st_size
+        container.rawSource = (filename, meta['dataStart'], status.st_size)
+        container.cacheWriter = (self, filename)
+        return True
+
+    def save(self, filename, container): # Writes the parsed file to the cache with the columns decoded so far, the container then saves the rest as they are decoded; a cache that can't be written is skipped
+        path = self.cachePath(filename)
+        temporary = path + '.tmp' + str(os.getpid()) # Written aside and then moved into place so a half written cache is never read
+        try:
+            status = os.stat(filename)
+            shutil.rmtree(temporary, ignore_errors=True)
+            os.makedirs(temporary)
+            headers = container.getFormattedHeader()
+            for index, head in enumerate(headers):
+                if head in container.columns and headers.index(head) == index:
+                    np.save(os.path.join(temporary, 'column' + str(index) + '.npy'), container.columns[head])
+            if container.rowTimes is not None:
+                np.save(os.path.join(temporary, 'time.npy'), container.rowTimes)
+            meta = {
+                'formatVersion': self.formatVersion,
+                'size': status.st_size,
+                'mtime': status.st_mtime_ns,
+                'hash': self.contentHash(filename),
+                'version': container.version,
+                'location': container.location,
+                'AODLevel': container.AODLevel,
+                'description': container.description,
+                'contactInfo': container.contactInfo,
+                'reference': container.reference,
+                'header': container.header,
+                'headers': headers,
+                'numeric': [bool(container.isNumeric(head)) for head in headers],
+                'dataStart': container.dataStart,
+                'dataLength': len(container)
+            }
+            self._writeMeta(temporary, meta)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(temporary, path)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+        container.cacheWriter = (self, filename)
+
+    def saveColumn(self, filename, container, head): # Adds a newly decoded column to the file's cache
+        self._saveArray(filename, 'column' + str(container.getFormattedHeader().index(head)), container.columns[head])
+
+    def saveRowTimes(self, filename, container): # Adds the rows' times, once they are parsed, to the file's cache
+        self._saveArray(filename, 'time', container.rowTimes)
+
+    def _saveArray(self, filename, name, array):
+        arrayFile = os.path.join(self.cachePath(filename), name + '.npy')
+        temporary = arrayFile + '.tmp' + str(os.getpid())
+        try:
+            with open(temporary, 'wb') as npyFile:
+                np.save(npyFile, array)
+            os.replace(temporary, arrayFile)
+        except OSError: # The cache was removed or can't be written
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def clear(self, filename):
+        shutil.rmtree(self.cachePath(filename), ignore_errors=True)
+
+    def _writeMeta(self, path, meta):
+        try:
+            with open(os.path.join(path, 'meta.json'), 'w') as metaFile:
+                json.dump(meta, metaFile)
+        except OSError:
+            pass
+# end ParsedFileCache
+
+class PlotCache: # Least recently used cache of calculated plots (the x, y and error arrays), kept under a memory cap; the oldest plots are dropped first
+    def __init__(self, maxBytes=64*1024*1024):
+        self.maxBytes = maxBytes # Set to 0 to turn the cache off
+        self.plots = collections.OrderedDict() # From the least to the most recently used
+        self.size = 0
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self.plots)
+
+    @staticmethod
+    def sizeOf(plot):
+        return sum(np.asarray(array).nbytes for array in plot)
+
+    def get(self, key): # The plot stored under key, None if there isn't one
+        plot = self.plots.get(key)
+        if plot == None:
+            self.misses += 1
+            return None
+        self.plots.move_to_end(key)
+        self.hits += 1
+        return plot
+
+    def put(self, key, plot): # Stores the plot and returns it; its arrays are made read only since every caller is handed the same ones
+        for array in plot:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+        if key in self.plots:
+            self.size -= self.sizeOf(self.plots.pop(key))
+        size = self.sizeOf(plot)
+        if size > self.maxBytes: # Bigger than the whole cache
+            return plot
+        self.plots[key] = plot
+        self.size += size
+        while self.size > self.maxBytes:
+            _, oldest = self.plots.popitem(last=False)
+            self.size -= self.sizeOf(oldest)
+        return plot
+
+    def setMaxBytes(self, maxBytes):
+        self.maxBytes = maxBytes
+        while self.size > self.maxBytes:
+            _, oldest = self.plots.popitem(last=False)
+            self.size -= self.sizeOf(oldest)
+
+    def clear(self):
+        self.plots.clear()
+        self.size = 0
+# end PlotCache
+
+class TableWriter: # Writes a table one chunk of columns at a time to Parquet, Arrow IPC or CSV (compressed as its extension says: .gz, .bz2 or .xz), so no table is ever held whole
+    # Parquet and Arrow need pyarrow; missing (NaN) values are written as nulls, or as empty fields in a CSV
+    formats = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow', '.csv': 'csv', '.txt': 'csv'}
+    openers = {'.gz': functools.partial(gzip.open, compresslevel=6), '.bz2': bz2.open, '.xz': lzma.open} # gzip at zlib's usual level, its own default is much slower for little gain
+
+    def __init__(self, path, fileFormat=None, compression=None): # fileFormat is 'parquet', 'arrow' or 'csv', by default from the extension; compression is pyarrow's (zstd by default for Parquet, none for Arrow)
+        self.path = path
+        self.fileFormat = TableWriter.formatOf(path) if fileFormat == None else fileFormat
+        self.compression = compression
+        self.writer = None # The open file, once the first chunk is written
+        self.headers = None
+        self.schema = None
+        self.rows = 0
+        if self.fileFormat not in ('parquet', 'arrow', 'csv'):
+            raise ValueError('Unknown export format: ' + str(self.fileFormat))
+        if self.fileFormat != 'csv' and pyarrow == None:
+            raise ImportError('Exporting to ' + self.fileFormat + ' needs pyarrow, install it or export to csv')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @staticmethod
+    def formatOf(path):
+        root, extension = os.path.splitext(str(path).lower())
+        if extension in TableWriter.openers:
+            root, extension = os.path.splitext(root)
+        if extension not in TableWriter.formats:
+            raise ValueError('Can not tell the export format of ' + str(path) + ', use one of ' + ', '.join(TableWriter.formats))
+        return TableWriter.formats[extension]
+
+    @staticmethod
+    def asText(values): # A column as the text of its CSV fields
+        values = np.asarray(values)
+        if values.dtype.kind == 'M':
+            return np.datetime_as_string(values)
+        text = values.astype(str)
+        if values.dtype.kind == 'f':
+            text[np.isnan(values)] = ''
+        return text
+
+    def write(self, columns): # Appends a chunk of rows, columns is header -> values; every chunk needs the headers of the first one
+        if self.headers == None:
+            self.headers = list(columns)
+        elif list(columns) != self.headers:
+            raise ValueError('Every chunk needs the columns ' + ', '.join(self.headers))
+        length = len(next(iter(columns.values()), []))
+        if self.fileFormat == 'csv':
+            if self.writer == None:
+                extension = os.path.splitext(str(self.path).lower())[1]
+                self.writer = TableWriter.openers.get(extension, open)(self.path, 'wt', newline='')
+                self.writer.write(','.join(self.headers) + '\n')
+            fields = [TableWriter.asText(columns[head]).tolist() for head in self.headers]
+            if length != 0:
+                self.writer.write('\n'.join(map(','.join, zip(*fields))) + '\n')
+        else:
+            table = pyarrow.table({head: pyarrow.array(np.asarray(values), from_pandas=True) for head, values in columns.items()}) # from_pandas makes NaN null
+            if self.writer == None:
+                self.schema = table.schema # Of the first chunk, the ones after it are cast to it
+                if self.fileFormat == 'parquet':
+                    self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=self.compression or 'zstd')
+                else:
+                    self.writer = pyarrow.ipc.new_file(self.path, self.schema, options=pyarrow.ipc.IpcWriteOptions(compression=self.compression))
+            self.writer.write_table(table.cast(self.schema))
+        self.rows += length
+
+    def close(self):
+        if self.writer != None:
+            self.writer.close()
+            self.writer = None
+# end TableWriter
+
+def _sharedPlotArrays(buffer, shape): # The (column x time) matrix, the times and the requested rows, as laid out one after the other in a shared memory buffer
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=buffer)
+    stamps = np.ndarray(shape[1], dtype='datetime64[s]', buffer=buffer, offset=matrix.nbytes)
+    inRange = np.ndarray(shape[1], dtype=bool, buffer=buffer, offset=matrix.nbytes + stamps.nbytes)
+    return matrix, stamps, inRange
+
+def _calculatePlotsInSharedMemory(name, shape, first, last, heads, filters, rowMasks): # Calculates the plots of the columns first to last of the shared matrix in a worker process, with the filters' report
+    shared = mp.shared_memory.SharedMemory(name=name)
+    try:
+        matrix, stamps, inRange = _sharedPlotArrays(shared.buf, shape)
+        pipeline = FilterPipeline(filters)
+        results = Analysis()._calculatePlotsOfMatrix(matrix[first:last], stamps, inRange, heads, pipeline, rowMasks)
+        del matrix, stamps, inRange # The memory can't be released while numpy still points into it
+        return results, pipeline.report
+    finally:
+        shared.close()
+
+_renderers = {} # settings -> the Analysis a worker process saves plots with, so its plot template is reused from one plot to the next
+
+def _renderPlot(settings, head, xData, yData, yErr, fit): # Saves one plot in a worker process, settings come from Analysis._outputSettings
+    analysis = _renderers.get(settings)
+    if analysis == None:
+        directory, formats, prefix, fitDegree, decimation, decimationWidth = settings
+        analysis = Analysis()
+        analysis.setOutput(directory, formats, 1, prefix)
+        analysis.fitDegree = fitDegree
+        analysis.setDecimation(decimation, decimationWidth)
+        _renderers[settings] = analysis
+    return analysis._drawplot(head, xData, yData, yErr, fit)
+
+def _parseByteRange(filename, start, end, header, numeric): # Parses the data lines between two byte offsets of a file in a worker process
+    with open(filename, 'rb') as dataFile:
+        dataFile.seek(start)
+        block = dataFile.read(end - start)
+    return ColumnParser.parseBlock(block, header, numeric)
+
+def _loadCatalogFile(filename, cacheDirectory): # Parses one file of a SiteCatalog in a worker process
+    analysis = Analysis()
+    analysis.cache = ParsedFileCache(cacheDirectory)
+    analysis.readDataFromFile(filename)
+    analysis.aeronetData.getFormattedData() # Every column and the rows' times are decoded and saved, so the whole file is in the cache
+    analysis.aeronetData.getRowTimes()
+    if analysis.cache.load(filename, dataContainer()): # The parsed file is on disk, the catalog maps it instead of receiving a copy
+        return None
+    return analysis.aeronetData
+
+class SiteCatalog: # Finds the aeronet files in a directory tree, identifies them from their header lines, and loads them in parallel into one dataset that can be queried by site, product, level and time
+    def __init__(self, cacheDirectory=None):
+        self.entries = [] # One dictionary per file: filename, site, product, level, version, and first/last once loaded
+        self.data = {} # filename -> dataContainer
+        self.cache = ParsedFileCache(cacheDirectory)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __str__(self):
+        information = ''
+        for entry in self.entries:
+            information += entry['site'] + ', ' + entry['product'] + ', Level ' + entry['level'] + ': ' + entry['filename'] + '\n'
+        return information
+
+    @staticmethod
+    def identify(filename): # Returns the site, product and level of an aeronet file from its header lines, or None if it isn't one
+        try:
+            with open(filename, 'r', errors='replace') as dataFile:
+                lines = [dataFile.readline().strip() for _ in range(3)]
+        except OSError:
+            return None
+        if not lines[0].startswith('AERONET'):
+            return None
+        version, level = '', ''
+        product = dataContainer.productOf(lines[2])
+        match = re.search(r'Version\s*(\d+)\s*:.*?Level\s*([\d.]+)', lines[2]) # e.g. "Version 3: AOD Level 2.0"
+        if match != None:
+            version, level = match.group(1), match.group(2)
+        extension = re.search(r'\.(\w*?)_?lev(\d+)$|\.(all)$', filename) # e.g. ".tot_lev20", ".ONEILL_lev15", ".lev20", ".all"
+        if extension != None:
+            code = extension.group(1) or extension.group(3)
+            if code:
+                product += ' (' + code + ')'
+            if level == '' and extension.group(2) != None:
+                level = str(int(extension.group(2))/10)
+        return {'filename': filename, 'site': lines[1], 'product': product, 'level': level, 'version': version}
+
+    def scan(self, directory, pattern=None): # Walks the directory tree adding every aeronet file, pattern is an optional regular expression the file names must match
+        found = []
+        for root, folders, files in os.walk(directory):
+            folders[:] = sorted(folder for folder in folders if not folder.endswith('.npcache')) # Skip the parsed file caches
+            for name in sorted(files):
+                if pattern != None and re.search(pattern, name) == None:
+                    continue
+                entry = self.identify(os.path.join(root, name))
+                if entry != None and all(entry['filename'] != known['filename'] for known in self.entries):
+                    found.append(entry)
+        self.entries += found
+        return found
+
+    def load(self, workers=None): # Parses every file not yet loaded in a pool of worker processes
+        pending = [entry['filename'] for entry in self.entries if entry['filename'] not in self.data]
+        if len(pending) == 0:
+            return
+        if workers == 1 or len(pending) == 1: # Not worth starting any processes
+            results = [_loadCatalogFile(filename, self.cache.directory) for filename in pending]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_loadCatalogFile, pending, itertools.repeat(self.cache.directory)))
+        for filename, container in zip(pending, results):
+            if container == None:
+                container = dataContainer()
+                self.cache.load(filename, container)
+            self.data[filename] = container
+        for entry in self.entries:
+            times = self.data[entry['filename']].getTimeIndex().stamps
+            entry['first'] = times[0] if times.size != 0 else None
+            entry['last'] = times[-1] if times.size != 0 else None
+
+    def select(self, site=None, product=None, level=None, year=None): # The entries matching every given field; the site and product match without case
+        selected = []
+        for entry in self.entries:
+            if site != None and entry['site'].lower() != site.lower():
+                continue
+            if product != None and product.lower() not in entry['product'].lower():
+                continue
+            if level != None and float(entry['level'] or 'nan') != float(level):
+                continue
+            if year != None and entry.get('first') != None:
+                if int(year) < entry['first'].astype('datetime64[Y]').astype(int) + 1970 or int(year) > entry['last'].astype('datetime64[Y]').astype(int) + 1970:
+                    continue
+            selected.append(entry)
+        return selected
+
+    def sites(self):
+        return sorted(set(entry['site'] for entry in self.entries))
+
+    def getContainer(self, filename):
+        return self.data[filename]
+
+    def getAnalysis(self, filename): # An Analysis of one loaded file, so it can be plotted as usual
+        analysis = Analysis()
+        analysis.filename = filename
+        analysis.aeronetData = self.data[filename]
+        return analysis
+
+    def render(self, directory, formats=('png',), workers=None, site=None, product=None, level=None, year=None): # Saves every plot of every matching file in directory, returns how many were saved
+        # The files are named site_product_level_header.format
+        count = 0
+        for entry in self.select(site, product, level, year):
+            if entry['filename'] not in self.data:
+                continue
+            analysis = self.getAnalysis(entry['filename'])
+            analysis.setOutput(directory, formats, workers, entry['site'] + '_' + entry['product'] + '_lev' + entry['level'])
+            count += analysis.drawAllPlots()
+        return count
+
+    def aggregate(self, heads, site=None, product=None, level=None, year=None, degree=3): # The RunningAggregates of every site, each one merged from the site's matching files
+        results = {}
+        for entry in self.select(site, product, level, year):
+            container = self.data.get(entry['filename'])
+            if container == None:
+                continue
+            aggregates = RunningAggregates(heads, degree)
+            aggregates.update(container.getLocalTimes(), {head: container.getColumn(head) for head in heads if head in container.getFormattedHeader() and container.isNumeric(head)})
+            if entry['site'] in results:
+                results[entry['site']].merge(aggregates)
+            else:
+                results[entry['site']] = aggregates
+        return results
+
+    def monthlyClimatology(self, heads, site=None, product=None, level=None, percentiles=(5, 25, 75, 95), byYear=False): # site -> the Climatology.compute of the heads over all of the site's matching files
+        # A file without one of the heads counts it as missing
+        times, columns = {}, {}
+        for entry in self.select(site, product, level):
+            container = self.data.get(entry['filename'])
+            if container == None:
+                continue
+            rowTimes = container.getLocalTimes()
+            times.setdefault(entry['site'], []).append(rowTimes)
+            for head in heads:
+                present = head in container.getFormattedHeader() and container.isNumeric(head)
+                columns.setdefault(entry['site'], {}).setdefault(head, []).append(np.asarray(container.getColumn(head), dtype=np.float64) if present else np.full(rowTimes.size, np.nan))
+        return {name: Climatology.compute(np.concatenate(times[name]), {head: np.concatenate(values) for head, values in columns[name].items()}, percentiles, byYear) for name in times}
+
+    def query(self, head, site=None, product=None, level=None, month0=None, month1=None, year=None, start=None, end=None): # One column across every matching file in time order
+        # Returns the times, values and site of every row; files without the column are left out
+        times, values, sites = [], [], []
+        for entry in self.select(site, product, level, year):
+            container = self.data.get(entry['filename'])
+            if container == None or head not in container.getFormattedHeader():
+                continue
+            timeIndex = container.getTimeIndex()
+            rows = timeIndex.mask(month0, month1, year, start, end)
+            times.append(timeIndex.stamps[rows])
+            values.append(timeIndex.sortRows(np.asarray(container.getColumn(head)))[rows])
+            sites.append(np.full(np.count_nonzero(rows), entry['site']))
+        if len(times) == 0:
+            return np.empty(0, dtype='datetime64[s]'), np.empty(0), np.empty(0, dtype=str)
+        times, values, sites = np.concatenate(times), np.concatenate(values), np.concatenate(sites)
+        order = np.argsort(times, kind='stable')
+        return times[order], values[order], sites[order]
+# end SiteCatalog
+
 class Interface:
     @staticmethod
     def printMainMenu():
@@ -775,6 +2638,43 @@ class Interface:
         '\n')
     # end printMainMenu
 
+    @staticmethod
+    def exportCommand(arguments): # python AeronetDataAnalysis.py export FILE OUTPUT [options], writes a file's rows or aggregates for other programs without going through the menu
+        parser = argparse.ArgumentParser(prog='AeronetDataAnalysis.py export', description='Exports the rows, or the aggregates, of an aeronet file to Parquet (.parquet), Arrow IPC (.arrow) or CSV (.csv, .csv.gz, .csv.bz2, .csv.xz)')
+        parser.add_argument('filename', help='The aeronet file')
+        parser.add_argument('output', help='The file to write, its extension tells the format')
+        parser.add_argument('--heads', nargs='+', help='The columns to export, every one by default')
+        parser.add_argument('--start', help='The first time to export, e.g. 2022-03-01 or 2022-03-01T12:00')
+        parser.add_argument('--end', help='The time to stop before')
+        parser.add_argument('--year', help='Only the rows of this year')
+        parser.add_argument('--filtered', action='store_true', help='Leave the values the quality filters drop missing')
+        parser.add_argument('--aggregate', choices=('halfDay', 'day', 'month'), help='Export the statistics of every period instead of the rows')
+        parser.add_argument('--stream', type=int, metavar='ROWS', help='Stream the file ROWS lines at a time instead of loading it')
+        parser.add_argument('--format', choices=('parquet', 'arrow', 'csv'), help='The format, instead of the one of the extension')
+        parser.add_argument('--timezone', help="An IANA timezone (e.g. America/Los_Angeles) or 'longitude' to export local times, UTC by default")
+        options = parser.parse_args(arguments)
+        if options.stream != None and options.year != None:
+            parser.error('--year needs the file loaded, use --start and --end with --stream')
+        if options.stream != None and options.filtered:
+            parser.error('--filtered needs the file loaded, leave out --stream')
+        analysis = Analysis()
+        analysis.setTimeZone(options.timezone)
+        filename = os.path.join(startingPath, options.filename)
+        output = os.path.join(startingPath, options.output)
+        if options.stream != None:
+            analysis.filename = filename
+        else:
+            analysis.readDataFromFile(filename)
+        if options.aggregate != None:
+            count = analysis.exportAggregates(output, options.heads, options.aggregate, options.filtered, options.year, options.start, options.end, options.format, options.stream)
+        elif options.stream != None:
+            count = analysis.exportFromBlocks(output, filename, options.heads, options.start, options.end, options.format, options.stream)
+        else:
+            count = analysis.exportData(output, options.heads, options.filtered, years=options.year, start=options.start, end=options.end, fileFormat=options.format)
+        print('Wrote', count, 'rows to', output)
+        return count
+    # end exportCommand
+
     @staticmethod
     def analyticInterface():
         aeronetAnalyzer = Analysis()
@@ -782,6 +2682,7 @@ class Interface:
         affirmativeAnswers = ['y', 'yes']
         months = ['Jan.', 'Feb.', 'Mar.', 'Apr.', 'May.', 'Jun.', 'Jul.', 'Aug.', 'Sep.', 'Oct.', 'Nov.', 'Dec.']
         monthsLong = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october', 'november', 'december']
+        plotsPerFigure = 12 # The keyword's plots are drawn as small multiples, this many to a window
         
         while (userInput != 0): # If input is 0 the program will close.
             Interface.printMainMenu()
@@ -807,7 +2708,7 @@ class Interface:
             elif (userInput == 4): # draw all plots
                 print('Calculating...')
                 print('Successfully drew ', aeronetAnalyzer.drawAllPlots(), ' plots')
-                #print('Successfully drew ', aeronetAnalyzer.drawAllPlotsMultProcessor(), ' plots') # WIP
+                #print('Successfully drew ', aeronetAnalyzer.drawAllPlotsMultProcessor(), ' plots') # Calculates the plots on every core
             elif (userInput == 5): # draw graph of specific data
                 listOfHeaders = aeronetAnalyzer.getHeaders()
                 for i in listOfHeaders: # Printing options
@@ -894,9 +2795,9 @@ class Interface:
                                 if userChoice4.lower() == value:
                                     range1 = index+1
                         if userChoice5 == '':
-                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, True, monthStart=range0, monthEnd=range1)
+                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, True, monthStart=range0, monthEnd=range1, grid=plotsPerFigure)
                         else:
-                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, True, monthStart=range0, monthEnd=range1, year=userChoice5)
+                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, True, monthStart=range0, monthEnd=range1, year=userChoice5, grid=plotsPerFigure)
                     else:
                         if userChoice3.lower() in monthsLong and userChoice4.lower() in monthsLong:
                             for index, value in enumerate(monthsLong):
@@ -911,9 +2812,9 @@ class Interface:
                                 if userChoice4.lower() == value:
                                     range1 = index+1
                         if userChoice5 == '':
-                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, monthStart=range0, monthEnd=range1)
+                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, monthStart=range0, monthEnd=range1, grid=plotsPerFigure)
                         else:
-                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, monthStart=range0, monthEnd=range1, year=userChoice5)  
+                            count = aeronetAnalyzer.drawSpecificPlots(heads, dateHeader, monthStart=range0, monthEnd=range1, year=userChoice5, grid=plotsPerFigure)  
                 if count != 0:
                     print('Successfully drew ', count, ' plots.')
                 else:
@@ -975,4 +2876,7 @@ class Interface:
 # end Interface
 
 if __name__ == "__main__":
-    Interface.analyticInterface()
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        Interface.exportCommand(sys.argv[2:])
+    else:
+        Interface.analyticInterface()
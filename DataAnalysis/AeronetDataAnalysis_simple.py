@@ -17,10 +17,28 @@ os.chdir(currentPath) # Sets the working directory to the current file's locatio
 
 # Second we import the list of libraries we are going to use
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import numpy as np
-import scipy as sp
-import time
-import datetime
+from AeronetDataAnalysis import LocalTime # The UTC to local time conversion is shared with the full program
+
+# Third we decide where the plots go
+outputDirectory = None # Set to a folder to save the plots there instead of showing them, on a non-interactive backend so no display is needed
+outputFormats = ('png',) # Any of 'png', 'svg' and 'pdf'
+if outputDirectory != None:
+    plt.switch_backend('Agg')
+    os.makedirs(outputDirectory, exist_ok=True)
+
+def showFigure(windowTitle, name): # Shows the current figure in a window, or saves it as name in every output format
+    if outputDirectory == None:
+        plt.get_current_fig_manager().set_window_title(windowTitle)
+        plt.get_current_fig_manager().resize(1280, 720)
+        plt.show()
+        return
+    figure = plt.gcf()
+    figure.set_size_inches(12.8, 7.2) # The 1280x720 of the window
+    for extension in outputFormats:
+        figure.savefig(os.path.join(outputDirectory, name.replace('/', '_') + '.' + extension), dpi=100)
+    plt.close(figure)
 
 # PHASE 1: Reading in all of the data available 
 
@@ -84,126 +102,60 @@ for index, value in enumerate(headers):
 #print(selectedTimes) # Debugging
 #print(selectedData) # Debugging
 
-# PHASE 3: Convert all data points into PST/GMT+7
-
-timeDifference = datetime.datetime.utcnow() - datetime.datetime.now() # Finding the difference between UTC0 and the local timezone
-def gmt0ToLocalTZ_conversion(dateData,timeData): # A function to convert the date and time of a data plot from UTC0 to the local timezone (PST)
-    # Date(dd:mm:yyyy),Time(hh:mm:ss)
-    oldTime = datetime.datetime.strptime(dateData + ':' + timeData + ':' + 'GMT', '%d:%m:%Y:%H:%M:%S:%Z') #  + ':' + 'GMT' # :%Z
-    newTime = oldTime - timeDifference
-    newDateData, newTimeData = '', ''
-    if len(str(newTime.day)) < 2:
-        newDateData = '0' + str(newTime.day) + ':'
-    else:
-        newDateData = str(newTime.day) + ':'
-    if len(str(newTime.month)) < 2:
-        newDateData += '0' + str(newTime.month) + ':'
-    else:
-        newDateData += str(newTime.month) + ':'
-    newDateData += str(newTime.year)
-
-    if len(str(newTime.hour)) < 2:
-        newTimeData = '0' + str(newTime.hour) + ':'
-    else:
-        newTimeData = str(newTime.hour) + ':'
-    if len(str(newTime.minute)) < 2:
-        newTimeData += '0' + str(newTime.minute) + ':'
-    else:
-        newTimeData += str(newTime.minute) + ':'
-    if len(str(newTime.second)) < 2:
-        newTimeData += '0' + str(newTime.second)
-    else:
-        newTimeData += str(newTime.second)
-    #if int(newTime.day) != oldTime.day: # Debugging
-        #print('Converting: ', dateData, timeData, ' to ', newDateData, newTimeData) # Debugging
-    return newDateData, newTimeData
+# PHASE 3: Convert all data points into local time (PST/PDT)
 
-adjustedDates, adjustedTimes = [], []
-for i, v in enumerate(selectedDates): # For every datapoint
-    adjustedDate, adjustedTime = gmt0ToLocalTZ_conversion(v, selectedTimes[i]) # Convert its date and time to the local timezone
-    adjustedDates.append(adjustedDate)
-    adjustedTimes.append(adjustedTime)
-#print(adjustedDates) # Debugging
-#print(adjustedTimes) # Debugging
+timeZone = 'America/Los_Angeles' # The site's IANA timezone, daylight saving time is followed
+dateCharacters = np.array(selectedDates, dtype='U10').view('U1').reshape(-1, 10)[:, [6, 7, 8, 9, 2, 3, 4, 5, 0, 1]] # dd:mm:yyyy to yyyy-mm-dd
+dateCharacters[:, [4, 7]] = '-'
+utcTimestamps = np.char.add(np.char.add(np.ascontiguousarray(dateCharacters).view('U10').ravel(), 'T'), np.array(selectedTimes, dtype='U8')).astype('datetime64[s]')
+adjustedTimestamps = LocalTime.convert(utcTimestamps, timeZone) # Every datapoint's date and time in the local timezone, converted the same way as in AeronetDataAnalysis
+#print(adjustedTimestamps) # Debugging
 
 
 #for i, v in enumerate(selectedData): # Debugging
-    #print(v, adjustedDates[i], adjustedTimes[i]) # Debugging
-#print(adjustedDates, '\n', adjustedTimes, '\n') # Debugging
-#print(len(selectedData), len(adjustedDates), len(adjustedTimes)) # Debugging
+    #print(v, adjustedTimestamps[i]) # Debugging
+#print(len(selectedData), len(adjustedTimestamps)) # Debugging
 
 # PHASE 4: Plot on a Gaussian Curve and Remove the outliers from the data set
 
 def standardDeviation(integerArray): # Computes the standard deviation of any given integer array
-    sum = 0
-    for x in integerArray:
-        sum = sum + (x-np.mean(integerArray))**2
-    return (np.sqrt(sum/len(integerArray)) * np.sqrt(2))
+    integerArray = np.asarray(integerArray, dtype=np.float64)
+    return (np.sqrt(np.mean((integerArray - np.mean(integerArray))**2)) * np.sqrt(2))
 
-xpoints, ypoints = [], []
 graph = False
 Amplitude = np.amax(selectedData)
 sigma = standardDeviation(selectedData)
-resultsData, resultsDate, resultsTime = [], [], []
+resultsData, resultsTimestamps = [], []
 if (2*sigma**2) == 0:
     print('Error: Cannot divide by zero.', userInput, ' data is in an invalid format:', selectedData[0])
     raise ZeroDivisionError # division by zero
 else:
-    for x in selectedData:
-        xpoints.append(x)
-        ypoints.append(Amplitude*np.exp(-(x-np.mean(selectedData))**2 / (2*sigma**2)))
+    xpointsNp = np.asarray(selectedData, dtype=np.float64) # The whole column at once
+    ypointsNp = Amplitude*np.exp(-(xpointsNp-np.mean(xpointsNp))**2 / (2*sigma**2))
     if graph:
-        xpointsNp, ypointsNp = np.array(xpoints), np.array(ypoints)
         title = 'Amplitude=' + str(Amplitude) + ' Sigma=' + str(sigma)
         plt.plot(xpointsNp, ypointsNp, 'ko')
         plt.title(title)
-        plt.get_current_fig_manager().set_window_title(userInput + ' with ' + str(xpointsNp.size) + ' data points.')
-        plt.show()
-    for index, value in enumerate(ypoints):
-        if (Amplitude-(sigma*2)) <= value <= (Amplitude+(sigma*2)):
-            if selectedData[index] == 0 or selectedData[index] == -999: # We will omit this type of data
-                continue
-            resultsData.append(selectedData[index])
-            resultsDate.append(adjustedDates[index])
-            resultsTime.append(adjustedTimes[index])
-print(len(resultsData), len(resultsDate), len(resultsTime)) # Debugging
+        showFigure(userInput + ' with ' + str(xpointsNp.size) + ' data points.', filename + '_' + userInput + '_gaussian')
+    keep = ((Amplitude-(sigma*2)) <= ypointsNp) & (ypointsNp <= (Amplitude+(sigma*2)))
+    keep &= (xpointsNp != 0) & (xpointsNp != -999) # We will omit this type of data
+    resultsData = xpointsNp[keep].tolist()
+    resultsTimestamps = adjustedTimestamps[keep]
+print(len(resultsData), len(resultsTimestamps)) # Debugging
 
 # PHASE 5: Clumping together datapoints that are within the same 12hrs of eachother, from 6pm to 6am and 6am to 6pm
-    # Condensing the values tooooo much, why? It should produce about 300 points instead of 40
-
-xdata, ydata, yMinMax, dataRange, nightTime, currentDate = [], [], [], [], False, time.strptime(resultsDate[0] + ':' + resultsTime[0], '%d:%m:%Y:%H:%M:%S')
-#datetime.datetime.strptime(resultsDate[0] + ':' + resultsTime[0], '%d:%m:%Y:%H:%M:%S')
-if int(resultsTime[0][0]) == 0 and int(resultsTime[0][1]) <=5 or int(resultsTime[0][0]) >= 1 and int(resultsTime[0][1]) >= 8: # Dynamically setting the nightTime boolean
-    nightTime = True
-else:
-    nightTime = False
-#print(currentDate) # Debugging
-#print(time.gmtime(time.mktime(currentDate)-86400)) # Debugging
-for index, value in enumerate(resultsData):
-    print(resultsDate[index], resultsTime[index], value)
-    if nightTime: # If it was night time
-        if int(resultsTime[index][0]) == 0 and int(resultsTime[index][1]) <= 5 or int(resultsTime[index][0]) >= 1 and int(resultsTime[index][1]) >= 8: # It is still night time
-                dataRange.append(value)
-        else: # It is no longer night time
-            if np.sum(dataRange) != 0.0:
-                xdata.append(resultsDate[index] + '_night')
-                ydata.append(np.sum(dataRange)/len(dataRange))
-                yMinMax.append(standardDeviation(dataRange))
-            dataRange.clear()
-            nightTime = False
-    else: # If it was day time
-        if int(resultsTime[index][0]) == 0 and int(resultsTime[index][1]) >= 6 or int(resultsTime[index][0]) == 1 and int(resultsTime[index][1]) <= 7: # It is still day time
-                dataRange.append(value)
-        else: # It is no longer day time
-            if np.sum(dataRange) != 0.0:
-                xdata.append(resultsDate[index] + '_day')
-                ydata.append(np.sum(dataRange)/len(dataRange))
-                yMinMax.append(standardDeviation(dataRange))
-            dataRange.clear()
-            nightTime = True
-print(resultsDate)
+    # Every point gets the number of its half-day, floor((time - 6am)/12hrs) counted from 1970, so day half-days are even and night half-days are odd
+
+halfDays = (resultsTimestamps - np.datetime64('1970-01-01T06:00:00')) // np.timedelta64(12, 'h')
+halfDayIds, halfDayIndex, halfDayCounts = np.unique(halfDays, return_inverse=True, return_counts=True)
+resultsDataNp = np.array(resultsData)
+ydata = np.bincount(halfDayIndex, resultsDataNp) / halfDayCounts # The mean of every half-day
+yMinMax = np.sqrt(np.bincount(halfDayIndex, (resultsDataNp - ydata[halfDayIndex])**2) / halfDayCounts) * np.sqrt(2) # Same as standardDeviation for every half-day
+labelDates = np.datetime_as_string((np.datetime64('1970-01-01T12:00:00') + halfDayIds*np.timedelta64(12, 'h')).astype('datetime64[D]')).astype('U10').view('U1').reshape(-1, 10)[:, [8, 9, 7, 5, 6, 4, 0, 1, 2, 3]] # yyyy-mm-dd to dd:mm:yyyy, nights take the date they end on
+labelDates[:, [2, 5]] = ':'
+xdata = np.char.add(np.ascontiguousarray(labelDates).view('U10').ravel(), np.where(halfDayIds % 2 == 0, '_day', '_night')).tolist()
 print(xdata)
-xdataNp, ydataNp, yErrNp = np.array(xdata), np.array(ydata), np.array(yMinMax) # Converting our results to numpy arrays for use in the graphing phase
+xdataNp, ydataNp, yErrNp = np.array(xdata), ydata, yMinMax # Our results as numpy arrays for use in the graphing phase
 print(len(xdata), len(ydata), len(yMinMax)) # Debugging
 
 # PHASE 6: Calculating the curve/polynomial fit for the data set
@@ -215,46 +167,17 @@ def myCurveFit_Polynomial(xInput, a, b, c, d): # A polynomial representation for
 xData_poly = []
 for i, _ in enumerate(xdataNp): # Createing an array of all the integer indexes of our data
     xData_poly.append(i)
-coeff, covariance = sp.optimize.curve_fit(myCurveFit_Polynomial, xData_poly, ydataNp) # Covariances are not used
+polynomial = np.polynomial.polynomial.polyfit(xData_poly, ydataNp, 3) # The model is linear in its coefficients, so one least squares solve fits it; lowest power first
+coeff = polynomial[[1, 2, 3, 0]] # In the order myCurveFit_Polynomial takes them
 
 # PHASE 7: Plot the data on a graph
 
-#print(len(xdataNp), len(xdata), len(xpoints), len(resultsData),len(resultsDate), len(resultsTime)) # Debugging
-#print(resultsDate) # Debugging
+#print(len(xdataNp), len(xdata), len(xpoints), len(resultsData),len(resultsTimestamps)) # Debugging
+#print(resultsTimestamps) # Debugging
 #print(xdata) # Debugging
 
-months = ['Jan.', 'Feb.', 'Mar.', 'Apr.', 'May.', 'Jun.', 'Jul.', 'Aug.', 'Sep.', 'Oct.', 'Nov.', 'Dec.'] # Used for tick labels
-count = 0
-previousCount = 1 # Start off with zero since we will be subtracting 1 from this at each new tickRange/Label and we want to include the first day
-tickRange = [] # The break points for our xaxis
-tickLabels = [] # The months that the break points will be using
-years = [] # A list of years that the data covers
-currentMonth = str(xdataNp[0][3]) + str(xdataNp[0][4])
-for index, day in enumerate(xdataNp): # To make the break points (tickRange) for the months
-    count += 1
-    if day[4] != currentMonth[1]: # Any day where the month changes
-        tickRange.append(previousCount-1) # Start of the month
-        tickRange.append(previousCount + ((count - previousCount)/2)) # Middle of the month
-        if currentMonth[0] == '0':
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount-1][0]) + str(xdataNp[previousCount-1][1])) # Start of the month
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount + ((count - previousCount)//2)][0]) + str(xdataNp[previousCount + ((count - previousCount)//2)][1])) # Middle of the month
-        else:
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount-1][0]) + str(xdataNp[previousCount-1][1])) # Start of the month
-            tickLabels.append(months[eval(currentMonth)-1] + str(xdataNp[previousCount + ((count - previousCount)//2)][0]) + str(xdataNp[previousCount + ((count - previousCount)//2)][1])) # Middle of the month
-        currentMonth = str(day[3] + day[4])
-        previousCount = count
-    if index == len(xdataNp) - 1: # The last day in the data list
-        tickRange.append(previousCount-1) # Start of the month
-        tickRange.append(previousCount + ((count - previousCount)/2)) # Middle of the month
-        if currentMonth[0] == '0':
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount-1][0]) + str(xdataNp[previousCount-1][1])) # Start of the month
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount + (len(xdataNp) - previousCount) // 2][0]) + str(xdataNp[previousCount + (len(xdataNp) - previousCount) // 2][1])) # Middle of the month
-        else:
-            tickLabels.append(months[eval(currentMonth[1])-1] + str(xdataNp[previousCount-1][0]) + str(xdataNp[previousCount-1][1])) # Start of the month
-            tickLabels.append(months[eval(currentMonth)-1] + str(xdataNp[previousCount + (len(xdataNp) - previousCount) // 2][0]) + str(xdataNp[previousCount + (len(xdataNp) - previousCount) // 2][1])) # Middle of the month
-        previousCount = count
-    if str(day[6] + day[7] + day[8] + day[9]) not in years:
-        years.append(str(day[6] + day[7] + day[8] + day[9]))
+xTimes = np.datetime64('1970-01-01T12:00:00') + halfDayIds*np.timedelta64(12, 'h') # The middle of every half-day, the x axis is drawn in time
+years = np.unique(xTimes.astype('datetime64[Y]')).astype(str).tolist() # The years that the data covers
 if 'nm' in userInput:
     yaxisName = 'Wavelength(nm)'
 elif 'µm' in userInput:
@@ -281,20 +204,21 @@ cap = 2 # The cap sizes for the error bars
 xaxisName = 'Months' #'Date dd:mm:yyyy'
 if len(years) == 1: # If only one year was detected
     xaxisName = xaxisName + ' in ' + years[0]
-elif len(years) != 0: # Functionality for data with more than one year
-    xaxisName = xaxisName + ' in ('
-    for i in years:
-        if i != years[-1]:
-            xaxisName = xaxisName + i + ', '
-        elif i == years[len(years)-1]:
-            xaxisName = xaxisName + i + ')'
+elif len(years) <= 3: # Functionality for data with more than one year
+    xaxisName = xaxisName + ' in (' + ', '.join(years) + ')'
+else: # Too many years to list
+    xaxisName = 'Dates from ' + years[0] + ' to ' + years[-1]
 
-plt.errorbar(xData_poly, myCurveFit_Polynomial(xData_poly, coeff[0], coeff[1], coeff[2], coeff[3]), yerr=yErrNp, fmt='o', color='black', capsize=cap, markersize=3)
+plt.errorbar(xTimes, myCurveFit_Polynomial(xData_poly, coeff[0], coeff[1], coeff[2], coeff[3]), yerr=yErrNp, fmt='o', color='black', capsize=cap, markersize=3)
 plt.title(userInput)
 plt.xlabel(xaxisName)
 plt.ylabel(yaxisName)
-if len(tickRange) == len(tickLabels): # If for some reason the range is not in equal length to the labels, we won't do anything special to them
-    plt.xticks(ticks = tickRange, labels = tickLabels, minor=False)
-plt.get_current_fig_manager().set_window_title(windowTitle)
-plt.get_current_fig_manager().resize(1280, 720)
-plt.show()
+axis = plt.gca()
+if xTimes.max() - xTimes.min() <= np.timedelta64(370, 'D'): # Tick marks at the 1st and 15th of each month
+    axis.xaxis.set_major_locator(mdates.MonthLocator(bymonthday=(1, 15)))
+    axis.xaxis.set_major_formatter(mdates.DateFormatter('%b. %d'))
+else: # Longer spans get whatever ticks suit them
+    locator = mdates.AutoDateLocator()
+    axis.xaxis.set_major_locator(locator)
+    axis.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+showFigure(windowTitle, filename + '_' + userInput)
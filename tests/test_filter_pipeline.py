@@ -0,0 +1,30 @@
+import os
+import sys
+import numpy as np
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(projectDir, 'DataAnalysis'))
+from AeronetDataAnalysis import Analysis, FilterPipeline, PredicateFilter, ColumnParser
+
+#%% tests
+rng = np.random.default_rng(0)
+stamps = np.datetime64('2022-01-01T00:00:00') + np.sort(rng.integers(0, 30*86400, 2000)).astype('timedelta64[s]')
+matrix = rng.uniform(0.05, 0.3, (2, stamps.size))
+matrix[0, rng.choice(stamps.size, 300, replace=False)] = ColumnParser.missingValue # Missing as the plots get them
+matrix[1, rng.choice(stamps.size, 300, replace=False)] = np.nan # Missing as the columns hold them
+water = rng.uniform(0, 10, stamps.size)
+inRange = np.ones(stamps.size, dtype=bool)
+pipelines = (('an empty pipeline', FilterPipeline([]), ()),
+             ('a predicate only pipeline', FilterPipeline([PredicateFilter('Precipitable_Water(cm)', '<', 6)]), None))
+for name, pipeline, rowMasks in pipelines:
+    print('Start test of the missing values with ' + name)
+    if rowMasks == None:
+        rowMasks = pipeline.rowMasks(lambda head: water)
+    keep, usable = pipeline.evaluate(['AOD', 'AE'], matrix, inRange, rowMasks)
+    assert usable.all(), 'columns with measurements should be usable'
+    assert not keep[matrix == ColumnParser.missingValue].any(), '-999 fill values were kept'
+    assert not keep[np.isnan(matrix)].any(), 'NaN values were kept'
+    assert keep[0].sum() == np.count_nonzero((matrix[0] != ColumnParser.missingValue) & (water < 6 if len(rowMasks) != 0 else True)), 'measurements were dropped'
+    for xData, yData, yErr in Analysis()._calculatePlotsOfMatrix(matrix, stamps, inRange, ['AOD', 'AE'], pipeline, rowMasks):
+        assert yData.size != 0 and np.all(yData > 0), 'missing values reached the half-day means'
+print('Done')
@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(projectDir, 'DataAnalysis'))
+from AeronetDataAnalysis import FilterPipeline, GaussianFilter, SigmaClipFilter, MADFilter, IQRFilter, RangeFilter, PredicateFilter, ColumnParser
+
+def kept(qualityFilter, values): # The mask of one filter evaluated on its own over every row
+    keep, usable = FilterPipeline([qualityFilter]).evaluate(['values'], values[None], np.ones(values.size, dtype=bool))
+    return keep[0], usable[0]
+
+#%% tests
+rng = np.random.default_rng(0)
+values = rng.normal(0.2, 0.02, 5000)
+outliers = rng.choice(values.size, 20, replace=False)
+values[outliers] = 0.2 + rng.choice([-1, 1], 20)*rng.uniform(0.2, 0.5, 20) # At least 10 sigma out
+missing = rng.choice(np.setdiff1d(np.arange(values.size), outliers), 200, replace=False)
+values[missing] = ColumnParser.missingValue
+measured = values != ColumnParser.missingValue
+
+print('Start test of the sigma clip, MAD and IQR filters dropping outliers')
+for qualityFilter in (SigmaClipFilter(3), MADFilter(3.5), IQRFilter(1.5)):
+    keep, usable = kept(qualityFilter, values)
+    assert usable, str(qualityFilter) + ' could not test the column'
+    assert not keep[outliers].any(), str(qualityFilter) + ' kept an outlier'
+    assert not keep[missing].any(), str(qualityFilter) + ' kept a missing value'
+    assert np.count_nonzero(keep) > 0.97*np.count_nonzero(measured), str(qualityFilter) + ' dropped too many values'
+
+print('Start test of the MAD and IQR filters against numpy')
+present = values[measured]
+median = np.median(present)
+keep, _ = kept(MADFilter(3.5), values)
+assert np.array_equal(keep, measured & (0.6745*np.abs(values - median) <= 3.5*np.median(np.abs(present - median)))), 'MAD differs'
+lower, upper = np.percentile(present, [25, 75])
+keep, _ = kept(IQRFilter(1.5), values)
+assert np.array_equal(keep, measured & (values >= lower - 1.5*(upper - lower)) & (values <= upper + 1.5*(upper - lower))), 'IQR differs'
+
+print('Start test of the range and predicate filters')
+keep, _ = kept(RangeFilter(0.15, 0.25), values)
+assert np.array_equal(keep, measured & (values >= 0.15) & (values <= 0.25)), 'Range differs'
+water = rng.uniform(0, 10, values.size)
+pipeline = FilterPipeline([PredicateFilter('Precipitable_Water(cm)', '<', 6), RangeFilter(None, 5, 'Precipitable_Water(cm)')])
+keep, _ = pipeline.evaluate(['values'], values[None], np.ones(values.size, dtype=bool), pipeline.rowMasks(lambda head: water))
+assert np.array_equal(keep[0], measured & (water < 5)), 'the cross column filters differ'
+
+print('Start test of the Gaussian filter on a constant column')
+keep, usable = kept(GaussianFilter(), np.full(100, 0.2))
+assert not usable and not keep.any(), 'a constant column can not be tested'
+
+print('Start test of the filter report')
+pipeline = FilterPipeline([RangeFilter(0.15, 0.25), SigmaClipFilter(3)])
+pipeline.evaluate(['values'], values[None], np.ones(values.size, dtype=bool))
+for name, (keptCount, droppedCount) in pipeline.report['values'].items():
+    assert type(keptCount) == int and type(droppedCount) == int and keptCount + droppedCount == values.size, name + ' counts are wrong'
+print('Done')
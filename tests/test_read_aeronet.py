@@ -0,0 +1,100 @@
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(projectDir, 'DataAnalysis'))
+from AeronetDataAnalysis import Analysis
+
+preamble = ('AERONET Version 3;\nTest_Site\nVersion 3: AOD Level 2.0\nThe following data are automatically cloud cleared and quality assured.\n'
+            'Contact: PI=Someone; PI Email=someone@example.com\nUNITS can be found at,,, https://aeronet.gsfc.nasa.gov/new_web/units.html\n'
+            'Date(dd:mm:yyyy),Time(hh:mm:ss),AOD_500nm-Total,AOD_440nm-Total,Precipitable_Water(cm),AERONET_Site_Name\n')
+
+def makeRows(rng, start, count): # The times and values of count rows after start, and their lines as aeronet writes them
+    times = start + np.sort(rng.integers(0, 20*86400, count)).astype('timedelta64[s]')
+    values = np.round(rng.uniform(0.01, 0.5, (3, count)), 6) # As many decimals as the file has
+    values[rng.random((3, count)) < 0.1] = -999.0
+    text = np.datetime_as_string(times, unit='s')
+    lines = ''.join(day[8:10] + ':' + day[5:7] + ':' + day[0:4] + ',' + day[11:19] + ',' + ','.join('%.6f' % value if value != -999.0 else '-999.' for value in column) + ',Test_Site\n'
+                    for day, column in zip(text, values.T))
+    return times, np.where(values == -999.0, np.nan, values), lines
+
+def check(analysis, times, values, message): # The loaded columns and times are what was written
+    heads = ['AOD_500nm-Total', 'AOD_440nm-Total', 'Precipitable_Water(cm)']
+    for index, head in enumerate(heads):
+        assert np.allclose(analysis.aeronetData.getColumn(head), values[index], equal_nan=True, rtol=1e-6), message + ': ' + head + ' differs'
+    assert (analysis.aeronetData.getColumn('AERONET_Site_Name') == 'Test_Site').all(), message + ': the text column differs'
+    assert np.array_equal(analysis.aeronetData.getRowTimes(), times), message + ': the times differ'
+
+#%% tests
+rng = np.random.default_rng(0)
+directory = tempfile.mkdtemp()
+try:
+    filename = os.path.join(directory, 'test.tot_lev20')
+    times, values, lines = makeRows(rng, np.datetime64('2021-06-01T00:00:00'), 3000)
+    with open(filename, 'w') as dataFile:
+        dataFile.write(preamble + lines)
+
+    print('Start test of decoding the columns only when they are requested')
+    cold = Analysis()
+    cold.readDataFromFile(filename)
+    assert len(cold) == 3000 and cold.aeronetData.getLocation().strip() == 'Test_Site', 'the file was not read'
+    assert len(cold.aeronetData.columns) == 0, 'columns were decoded before they were requested'
+    cold.aeronetData.getColumn('AOD_500nm-Total')
+    assert list(cold.aeronetData.columns) == ['AOD_500nm-Total'], 'more than the requested column was decoded'
+    check(cold, times, values, 'cold read')
+
+    print('Start test of a warm load from the cache')
+    warm = Analysis()
+    warm.readDataFromFile(filename)
+    assert isinstance(warm.aeronetData.columns['AOD_500nm-Total'], np.memmap), 'the cached column is not mapped'
+    assert isinstance(warm.aeronetData.rowTimes, np.memmap), 'the cached times are not mapped'
+    check(warm, times, values, 'warm load') # The columns cold never decoded come from the file
+    single = Analysis()
+    single.readDataFromFile(filename, precision=np.float32)
+    assert single.aeronetData.getColumn('AOD_440nm-Total').dtype == np.float32, 'the precision was not applied to a warm load'
+    raw = Analysis()
+    raw.readDataFromFile(filename, keepRaw=True)
+    assert len(raw.aeronetData.getRawLines()) == 3000, 'keepRaw was not applied to a warm load'
+
+    print('Start test of the cache after the file is touched or changed')
+    os.utime(filename, None)
+    touched = Analysis()
+    touched.readDataFromFile(filename)
+    assert isinstance(touched.aeronetData.columns['AOD_500nm-Total'], np.memmap), 'a touched file with the same content was parsed again'
+    row = np.flatnonzero(~np.isnan(values[0]))[0]
+    changed = values.copy()
+    changed[0, row] = round(1 - values[0, row], 6) # Written just as wide, so the file keeps its size
+    rows = lines.splitlines(keepends=True)
+    rows[row] = rows[row].replace('%.6f' % values[0, row], '%.6f' % changed[0, row], 1)
+    with open(filename, 'w') as dataFile:
+        dataFile.write(preamble + ''.join(rows))
+    status = os.stat(filename)
+    os.utime(filename, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9)) # However coarse the clock, the modification time changes
+    reread = Analysis()
+    reread.readDataFromFile(filename)
+    check(reread, times, changed, 'changed file')
+
+    print('Start test of reading the rows appended to the file')
+    appendedTimes, appendedValues, appendedLines = makeRows(rng, times[-1] + np.timedelta64(1, 's'), 500)
+    with open(filename, 'a') as dataFile:
+        dataFile.write(appendedLines)
+    assert reread.readAppendedData() == 500, 'the appended rows were not read'
+    check(reread, np.concatenate((times, appendedTimes)), np.concatenate((changed, appendedValues), axis=1), 'appended file')
+
+    print('Start test of exporting the loaded rows and the streamed rows')
+    loaded = reread.exportData(os.path.join(directory, 'loaded.csv'), ['AOD_500nm-Total'])
+    streamed = reread.exportFromBlocks(os.path.join(directory, 'streamed.csv'), heads=['AOD_500nm-Total'], blockRows=700)
+    assert loaded == streamed == 3500, 'not every row was exported'
+    with open(os.path.join(directory, 'loaded.csv')) as loadedFile, open(os.path.join(directory, 'streamed.csv')) as streamedFile:
+        assert loadedFile.read() == streamedFile.read(), 'the loaded and streamed exports differ'
+    reread.setFilters()
+    filtered = reread.exportData(os.path.join(directory, 'filtered.csv'), ['AOD_500nm-Total'], filtered=True)
+    assert filtered == np.count_nonzero(~np.isnan(np.concatenate((changed[0], appendedValues[0])))), 'rows without a value were exported'
+    with open(os.path.join(directory, 'filtered.csv')) as filteredFile:
+        assert '-999' not in filteredFile.read(), 'a fill value was exported'
+finally:
+    shutil.rmtree(directory, ignore_errors=True)
+print('Done')
@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(projectDir, 'DataAnalysis'))
+from AeronetDataAnalysis import RunningAggregates
+
+def curve(aggregates, days): # The fitted curve at days since the aggregates' origin
+    return np.polyval(aggregates.fit('AOD'), days)
+
+#%% tests
+rng = np.random.default_rng(0)
+times = np.sort(np.datetime64('2003-01-01T00:00:00') + rng.integers(0, 20*365*86400, 30000).astype('timedelta64[s]'))
+days = (times - times[0])/np.timedelta64(1, 'D')
+exact = 0.47 - 2e-5*days + 3e-9*days**2 - 1e-13*days**3
+noisy = exact + rng.normal(0, 0.05, days.size)
+for name, values in (('an exact cubic', exact), ('a noisy cubic', noisy)):
+    print('Start test of the fit of running aggregates of ' + name + ' over a 20 year record')
+    expected = np.polyval(np.polyfit(days, values, 3), days)
+    single = RunningAggregates(['AOD'])
+    for block in np.array_split(np.arange(days.size), 7): # Updated one block at a time
+        single.update(times[block], {'AOD': values[block]})
+    assert np.max(np.abs(curve(single, days) - expected)) < 1e-9, 'single pass fit differs from np.polyfit'
+
+    print('Start test of merging the fits of running aggregates of ' + name + ' with different origins')
+    for first, second in ((slice(0, 12000), slice(12000, None)), (slice(12000, None), slice(0, 12000))): # Later file into an earlier one and the other way around
+        merged = RunningAggregates(['AOD'])
+        merged.update(times[first], {'AOD': values[first]})
+        other = RunningAggregates(['AOD'])
+        other.update(times[second], {'AOD': values[second]})
+        merged.merge(other)
+        shift = (times[0] - merged.origin)/np.timedelta64(1, 'D')
+        assert np.max(np.abs(curve(merged, days + shift) - expected)) < 1e-9, 'merged fit differs from np.polyfit'
+print('Done')